@@ -0,0 +1,361 @@
+# anti_entropy.py
+import os
+import sys
+import time
+
+import psycopg2
+import redis
+from psycopg2.extras import execute_values
+
+from sync_service import DB_CONFIGS, SHARDING_ENABLED, invalidate_cache, redis_client
+
+# Baza care câștigă când ambele versiuni ale unui rând au același updated_at
+ANTI_ENTROPY_AUTHORITY = os.environ.get("ANTI_ENTROPY_AUTHORITY", "db1")
+ANTI_ENTROPY_FANOUT = int(os.environ.get("ANTI_ENTROPY_FANOUT", 16))
+ANTI_ENTROPY_LEAF_SIZE = int(os.environ.get("ANTI_ENTROPY_LEAF_SIZE", 64))
+ANTI_ENTROPY_SEGMENT_SIZE = int(os.environ.get("ANTI_ENTROPY_SEGMENT_SIZE", 100000))
+# Limita de rânduri hash-uite pe secundă (însumat pe ambele baze)
+ANTI_ENTROPY_MAX_ROWS_PER_SEC = float(os.environ.get("ANTI_ENTROPY_MAX_ROWS_PER_SEC", 50000))
+# Cât așteptăm înainte să reparăm, ca replicarea aflată în zbor să ajungă
+ANTI_ENTROPY_SETTLE_DELAY = float(os.environ.get("ANTI_ENTROPY_SETTLE_DELAY", 2))
+ANTI_ENTROPY_INTERVAL = float(os.environ.get("ANTI_ENTROPY_INTERVAL", 60))
+# Între trecerile complete sunt recomparate doar bucățile scrise între timp
+ANTI_ENTROPY_FULL_INTERVAL = float(os.environ.get("ANTI_ENTROPY_FULL_INTERVAL", 86400))
+
+# Mărimea bucăților notate în employees_dirty (trigger-ul din setup_database.py)
+DIRTY_CHUNK_SIZE = 1024
+
+# Hash-ul unui interval: număr de rânduri + suma hash-urilor pe rând. Suma nu
+# depinde de ordine, deci se poate grupa direct pe sub-intervale. updated_at
+# nu intră în hash: contează doar conținutul.
+ROW_HASH = "hashtextextended(id::text || '|' || name || '|' || coalesce(position, ''), 0)"
+
+
+class AntiEntropy:
+    """
+    Compară db1 și db2 pe intervale de ID-uri, ca într-un arbore Merkle:
+
+    - cheia e parcursă în segmente de `segment_size` ID-uri;
+    - pentru un interval, fiecare bază calculează în SQL (count, sumă de
+      hash-uri) pe `fanout` sub-intervale, într-o singură interogare GROUP BY;
+    - coborâm doar în sub-intervalele care diferă, până la intervale de cel
+      mult `leaf_size` ID-uri, unde comparăm rândurile propriu-zise;
+    - un rând diferit pe cele două baze e rezolvat după updated_at
+      (last-writer-wins; la egalitate câștigă `authority`), iar un rând
+      prezent doar pe o bază e copiat pe cealaltă. Nu se șterge nimic: dacă
+      baza căreia îi lipsește rândul are un tombstone (employees_deleted)
+      mai nou decât rândul, acesta e doar raportat, ca să nu fie nici
+      înviat, nici pierdut.
+
+    Prima trecere (și apoi câte una la `full_interval` secunde) parcurge
+    toată cheia. Între ele, trigger-ul employees_mark_dirty notează pe fiecare
+    bază bucățile de DIRTY_CHUNK_SIZE ID-uri scrise, iar trecerea recompară
+    doar bucățile astea, deci costul crește cu scrierile și diferențele, nu
+    cu mărimea tabelei. Citirile sunt limitate la `max_rows_per_sec`, ca
+    jobul să poată rula continuu lângă traficul normal.
+    """
+
+    def __init__(
+        self,
+        db_configs,
+        authority="db1",
+        fanout=16,
+        leaf_size=64,
+        segment_size=100000,
+        max_rows_per_sec=50000,
+        settle_delay=2.0,
+        full_interval=86400.0,
+    ):
+        if authority not in db_configs:
+            raise ValueError(f"Bază de referință necunoscută: {authority}")
+        self.db_configs = db_configs
+        self.authority = authority
+        self.replica = next(name for name in db_configs if name != authority)
+        self.fanout = max(2, fanout)
+        self.leaf_size = max(1, leaf_size)
+        self.segment_size = segment_size
+        self.max_rows_per_sec = max_rows_per_sec
+        self.settle_delay = settle_delay
+        self.full_interval = full_interval
+
+        self._connections = {}
+        self._last_full = None
+        # Bucățile luate din employees_dirty și încă necomparate; rămân aici
+        # dacă trecerea e întreruptă, ca următoarea să le reia
+        self._pending_chunks = set()
+        self.counters = {
+            "passes": 0,
+            "full_passes": 0,
+            "chunks_checked": 0,
+            "ranges_compared": 0,
+            "rows_hashed": 0,
+            "leaves_different": 0,
+            "rows_inserted": 0,
+            "rows_updated": 0,
+            "rows_deleted_elsewhere": 0,
+        }
+
+    def _connection(self, name):
+        conn = self._connections.get(name)
+        if conn is None or conn.closed:
+            conn = psycopg2.connect(**self.db_configs[name])
+            conn.autocommit = True
+            self._connections[name] = conn
+        return conn
+
+    def _throttle(self, rows):
+        self.counters["rows_hashed"] += rows
+        if self.max_rows_per_sec > 0 and rows:
+            time.sleep(rows / self.max_rows_per_sec)
+
+    def id_bounds(self):
+        """[min, max + 1) peste ambele baze, sau None dacă sunt goale."""
+        lows, highs = [], []
+        for name in self.db_configs:
+            with self._connection(name).cursor() as cursor:
+                cursor.execute("SELECT min(id), max(id) FROM employees")
+                low, high = cursor.fetchone()
+            if low is not None:
+                lows.append(low)
+                highs.append(high)
+        if not lows:
+            return None
+        return min(lows), max(highs) + 1
+
+    def bucket_hashes(self, name, low, high, width):
+        """{începutul sub-intervalului: (count, sumă)} pentru [low, high)."""
+        with self._connection(name).cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT %(low)s + ((id - %(low)s) / %(width)s) * %(width)s AS bucket,
+                       count(*),
+                       sum({ROW_HASH})::text
+                FROM employees
+                WHERE id >= %(low)s AND id < %(high)s
+                GROUP BY 1
+                """,
+                {"low": low, "high": high, "width": width},
+            )
+            return {bucket: (count, digest) for bucket, count, digest in cursor.fetchall()}
+
+    def different_leaves(self, low, high):
+        """Intervalele de cel mult `leaf_size` ID-uri din [low, high) care diferă."""
+        leaves = []
+        stack = [(low, high)]
+        while stack:
+            low, high = stack.pop()
+            if high - low <= self.leaf_size:
+                leaves.append((low, high))
+                continue
+            width = max(self.leaf_size, -(-(high - low) // self.fanout))
+            left = self.bucket_hashes(self.authority, low, high, width)
+            right = self.bucket_hashes(self.replica, low, high, width)
+            self.counters["ranges_compared"] += 1
+            self._throttle(sum(c for c, _ in left.values()) + sum(c for c, _ in right.values()))
+            for bucket in sorted(set(left) | set(right), reverse=True):
+                if left.get(bucket) != right.get(bucket):
+                    stack.append((bucket, min(bucket + width, high)))
+        return sorted(leaves)
+
+    def take_dirty(self):
+        """
+        Mută bucățile din employees_dirty (de pe ambele baze) în
+        `_pending_chunks`; întoarce tot ce e de comparat.
+        """
+        for name in self.db_configs:
+            with self._connection(name).cursor() as cursor:
+                cursor.execute("DELETE FROM employees_dirty RETURNING chunk")
+                self._pending_chunks.update(chunk for (chunk,) in cursor.fetchall())
+        return set(self._pending_chunks)
+
+    def dirty_ranges(self, chunks):
+        """Bucățile consecutive comasate în intervale de cel mult `segment_size` ID-uri."""
+        ranges = []
+        for chunk in sorted(chunks):
+            low, high = chunk * DIRTY_CHUNK_SIZE, (chunk + 1) * DIRTY_CHUNK_SIZE
+            if ranges and ranges[-1][1] == low and high - ranges[-1][0] <= self.segment_size:
+                ranges[-1] = (ranges[-1][0], high)
+            else:
+                ranges.append((low, high))
+        return ranges
+
+    def _rows(self, name, low, high):
+        with self._connection(name).cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, name, position, updated_at FROM employees
+                WHERE id >= %s AND id < %s
+                """,
+                (low, high),
+            )
+            return {row[0]: row for row in cursor.fetchall()}
+
+    def _deleted_ids(self, name, rows):
+        """
+        ID-urile dintre `rows` ({id: rând de pe cealaltă bază}) șterse pe
+        `name` după ultima scriere a rândului (tombstone în employees_deleted).
+        """
+        with self._connection(name).cursor() as cursor:
+            cursor.execute(
+                "SELECT id, deleted_at FROM employees_deleted WHERE id = ANY(%s)",
+                (list(rows),),
+            )
+            return {
+                employee_id
+                for employee_id, deleted_at in cursor.fetchall()
+                if deleted_at >= rows[employee_id][3]
+            }
+
+    def repair(self, leaves):
+        """
+        Aduce ambele baze la aceeași versiune a fiecărui rând pe intervalele
+        date; întoarce ID-urile atinse.
+        """
+        writes = {name: [] for name in self.db_configs}
+        missing = {name: {} for name in self.db_configs}
+        for low, high in leaves:
+            rows = {name: self._rows(name, low, high) for name in self.db_configs}
+            left, right = rows[self.authority], rows[self.replica]
+            self._throttle(len(left) + len(right))
+            different = False
+            for employee_id in sorted(left.keys() | right.keys()):
+                mine, theirs = left.get(employee_id), right.get(employee_id)
+                if mine is not None and theirs is not None:
+                    if mine[:3] == theirs[:3]:
+                        continue
+                    if mine[3] >= theirs[3]:
+                        writes[self.replica].append(mine)
+                    else:
+                        writes[self.authority].append(theirs)
+                    self.counters["rows_updated"] += 1
+                elif mine is not None:
+                    missing[self.replica][employee_id] = mine
+                else:
+                    missing[self.authority][employee_id] = theirs
+                different = True
+            if different:
+                self.counters["leaves_different"] += 1
+
+        for name, rows in missing.items():
+            if not rows:
+                continue
+            deleted = self._deleted_ids(name, rows)
+            for employee_id in sorted(deleted):
+                self.counters["rows_deleted_elsewhere"] += 1
+                print(
+                    f"[Anti-Entropy] Rândul {employee_id} a fost șters pe '{name}', dar există "
+                    f"pe cealaltă bază; îl las neatins"
+                )
+            for employee_id, row in rows.items():
+                if employee_id not in deleted:
+                    self.counters["rows_inserted"] += 1
+                    writes[name].append(row)
+
+        touched = []
+        for name, rows in writes.items():
+            if not rows:
+                continue
+            conn = self._connection(name)
+            conn.autocommit = False
+            try:
+                with conn:
+                    with conn.cursor() as cursor:
+                        # Condiția pe updated_at nu suprascrie o scriere făcută
+                        # între citire și reparare
+                        execute_values(
+                            cursor,
+                            """
+                            INSERT INTO employees (id, name, position, updated_at) VALUES %s
+                            ON CONFLICT (id) DO UPDATE
+                            SET name = EXCLUDED.name, position = EXCLUDED.position,
+                                updated_at = EXCLUDED.updated_at
+                            WHERE employees.updated_at <= EXCLUDED.updated_at
+                            """,
+                            rows,
+                            page_size=len(rows),
+                        )
+            finally:
+                conn.autocommit = True
+            print(f"[Anti-Entropy] Reparat în '{name}': {len(rows)} rânduri")
+            touched.extend(row[0] for row in rows)
+        return touched
+
+    def run_pass(self):
+        """
+        O trecere: completă (segment cu segment) la pornire și la
+        `full_interval` secunde, altfel doar peste bucățile scrise între timp.
+        """
+        now = time.monotonic()
+        full = self._last_full is None or (
+            self.full_interval > 0 and now - self._last_full >= self.full_interval
+        )
+        # Luăm bucățile înainte de comparare: scrierile din timpul trecerii
+        # sunt notate din nou și recomparate data viitoare. O bucată iese din
+        # `_pending_chunks` abia după ce a fost comparată și reparată.
+        chunks = self.take_dirty()
+        if full:
+            bounds = self.id_bounds()
+            ranges = []
+            if bounds is not None:
+                ranges = [
+                    (low, min(low + self.segment_size, bounds[1]))
+                    for low in range(bounds[0], bounds[1], self.segment_size)
+                ]
+        else:
+            ranges = self.dirty_ranges(chunks)
+
+        for low, high in ranges:
+            leaves = self.different_leaves(low, high)
+            if leaves:
+                time.sleep(self.settle_delay)
+                invalidate_cache(self.repair(leaves))
+            if not full:
+                self._pending_chunks.difference_update(
+                    range(low // DIRTY_CHUNK_SIZE, high // DIRTY_CHUNK_SIZE)
+                )
+
+        if full:
+            self._pending_chunks.difference_update(chunks)
+            self._last_full = now
+            self.counters["full_passes"] += 1
+        else:
+            self.counters["chunks_checked"] += len(chunks)
+        self.counters["passes"] += 1
+        return dict(self.counters)
+
+    def run_forever(self, interval=60.0):
+        print(
+            f"--- Anti-entropy {self.authority} <-> {self.replica} pornit "
+            f"(max {self.max_rows_per_sec:.0f} rânduri/s) ---"
+        )
+        while True:
+            try:
+                stats = self.run_pass()
+                redis_client.hset("anti_entropy:stats", mapping=stats)
+                print(f"[Anti-Entropy] Statistici: {stats}")
+            except (psycopg2.Error, redis.RedisError) as e:
+                print(f"[Anti-Entropy] Trecere întreruptă: {e}")
+                for conn in self._connections.values():
+                    conn.close()
+                self._connections.clear()
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    if SHARDING_ENABLED:
+        # Bazele au intenționat rânduri diferite; "repararea" ar copia fiecare shard în celălalt
+        sys.exit("[Anti-Entropy] SHARDING=1: db1 și db2 nu sunt replici, jobul nu rulează")
+    job = AntiEntropy(
+        DB_CONFIGS,
+        authority=ANTI_ENTROPY_AUTHORITY,
+        fanout=ANTI_ENTROPY_FANOUT,
+        leaf_size=ANTI_ENTROPY_LEAF_SIZE,
+        segment_size=ANTI_ENTROPY_SEGMENT_SIZE,
+        max_rows_per_sec=ANTI_ENTROPY_MAX_ROWS_PER_SEC,
+        settle_delay=ANTI_ENTROPY_SETTLE_DELAY,
+        full_interval=ANTI_ENTROPY_FULL_INTERVAL,
+    )
+    if "--once" in sys.argv:
+        print(job.run_pass())
+    else:
+        job.run_forever(ANTI_ENTROPY_INTERVAL)
@@ -0,0 +1,219 @@
+# async_load_balancer.py
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+from load_balancer import (
+    BASE_DIR,
+    COALESCE_ENABLED,
+    EDGE_CACHE_ENABLED,
+    HTML_FILE,
+    LB_SERVER_TIMING,
+    POOL_IDLE_TIMEOUT,
+    ROUTE_POLICIES,
+    RYW_ENABLED,
+    RYW_MAX_PIN,
+    SHARDING_ENABLED,
+    STREAM_CHUNK_SIZE,
+    UPSTREAM_TIMEOUT,
+    acquire_backend,
+    read_your_writes,
+    selector,
+    shard_router,
+)
+from read_your_writes import SESSION_COOKIE, SESSION_HEADER
+from request_timing import SERVER_TIMING_HEADER, merge_server_timing
+from upstream_pool import UpstreamError, end_to_end_headers
+
+# Câte conexiuni deschidem maxim spre fiecare backend. Miile de clienți
+# conectați la LB așteaptă în coada connector-ului, nu pe thread-uri.
+ASYNC_UPSTREAM_CONNECTIONS = int(os.environ.get("LB_ASYNC_UPSTREAM_CONNECTIONS", 32))
+
+
+async def index(request):
+    """Aceeași pagină client_web.html ca în varianta Flask."""
+    print("[INFO] Trimit fișierul HTML:", HTML_FILE)
+    return web.FileResponse(os.path.join(BASE_DIR, HTML_FILE))
+
+
+async def debug_lb(request):
+    return web.json_response({
+        "engine": "asyncio",
+        "upstream_connections_per_backend": ASYNC_UPSTREAM_CONNECTIONS,
+        "selector": selector.stats(),
+        "read_your_writes": read_your_writes.stats() if RYW_ENABLED else None,
+        "sharding": shard_router.stats() if SHARDING_ENABLED else None,
+    })
+
+
+async def route_request(request):
+    """
+    Orice altă rută /employees, /employee/1 etc merge la unul din servere.
+    """
+    request_started = time.perf_counter()
+    if SHARDING_ENABLED and shard_router.scatters(request.method, request.path):
+        return await sharded_response(request)
+
+    pinned = None
+    if RYW_ENABLED and request.method == "GET":
+        pinned = read_your_writes.backends_for(
+            request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+        )
+    try:
+        backend = acquire_backend(request.method, request.path, prefer=pinned)
+    except UpstreamError as e:
+        return web.Response(text=f"Service Unavailable: {e}", status=503)
+    server_url = backend.url
+    print(f"Load Balancer (async) -> Redirecționare către: {server_url}")
+
+    started = time.perf_counter()
+    ok = False
+    response = None
+    try:
+        async with request.app["session"].request(
+            request.method,
+            URL(f"{server_url.rstrip('/')}{request.raw_path}", encoded=True),
+            headers=end_to_end_headers(request.headers.items(), drop=("host",)),
+            # Body-ul clientului curge direct spre backend, fără bufferizare
+            data=request.content if request.body_exists else None,
+            allow_redirects=False,
+        ) as resp:
+            resp_headers = end_to_end_headers(resp.headers.items())
+            if LB_SERVER_TIMING:
+                resp_headers = with_server_timing(resp_headers, request_started, started)
+            response = web.StreamResponse(status=resp.status, headers=resp_headers)
+            if RYW_ENABLED:
+                read_your_writes.learn(server_url, resp_headers)
+                token = read_your_writes.issue(resp_headers) if (
+                    request.method != "GET" and resp.status < 400
+                ) else None
+                if token:
+                    response.headers[SESSION_HEADER] = token
+                    response.set_cookie(
+                        SESSION_COOKIE, token, max_age=int(RYW_MAX_PIN) + 1,
+                        httponly=True, samesite="Lax",
+                    )
+            await response.prepare(request)
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                await response.write(chunk)
+            await response.write_eof()
+            ok = resp.status < 500
+            return response
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        if response is not None and response.prepared:
+            # Headerele au plecat deja spre client, nu mai putem trimite 503
+            raise
+        return web.Response(text=f"Service Unavailable: {e}", status=503)
+    finally:
+        selector.release(backend, time.perf_counter() - started, ok)
+
+
+def with_server_timing(resp_headers, request_started, upstream_started):
+    """
+    Server-Timing-ul backend-ului urmat de `upstream` (până la headerele
+    lui) și `lb` (restul), ca în varianta Flask. Fără profiler aici.
+    """
+    now = time.perf_counter()
+    upstream = now - upstream_started
+    backend_values = [v for k, v in resp_headers if k.lower() == SERVER_TIMING_HEADER.lower()]
+    resp_headers = [(k, v) for k, v in resp_headers if k.lower() != SERVER_TIMING_HEADER.lower()]
+    resp_headers.append((
+        SERVER_TIMING_HEADER,
+        merge_server_timing(backend_values, [("upstream", upstream), ("lb", now - request_started - upstream)]),
+    ))
+    return resp_headers
+
+
+async def sharded_response(request):
+    """
+    Rută adunată de la toate shard-urile, cu același ShardRouter ca varianta
+    Flask; cererile blocante către shard-uri rulează pe thread-uri, iar
+    bucățile listei interclasate sunt trimise pe măsură ce sunt produse.
+    """
+    body = await request.read()
+    headers = dict(end_to_end_headers(request.headers.items(), drop=("host",)))
+    try:
+        status, resp_headers, chunks = await asyncio.to_thread(
+            shard_router.handle, request.method, request.path, request.query_string, headers, body
+        )
+    except UpstreamError as e:
+        return web.Response(text=f"Service Unavailable: {e}", status=503)
+
+    response = web.StreamResponse(status=status, headers=resp_headers)
+    await response.prepare(request)
+    chunks = iter(chunks)
+    try:
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            await response.write(chunk)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    await response.write_eof()
+    return response
+
+
+async def _open_session(app):
+    connector = aiohttp.TCPConnector(
+        limit=0,
+        limit_per_host=ASYNC_UPSTREAM_CONNECTIONS,
+        keepalive_timeout=POOL_IDLE_TIMEOUT,
+    )
+    app["session"] = aiohttp.ClientSession(
+        connector=connector,
+        # Fără limită totală: un body mare în streaming poate dura mai mult
+        timeout=aiohttp.ClientTimeout(
+            total=None, sock_connect=UPSTREAM_TIMEOUT, sock_read=UPSTREAM_TIMEOUT
+        ),
+        auto_decompress=False,
+        # Headerele de conținut vin doar de la client, nu le inventăm noi
+        skip_auto_headers=("Accept-Encoding", "Content-Type"),
+    )
+
+
+async def _close_session(app):
+    await app["session"].close()
+
+
+def create_app():
+    app = web.Application()
+    app.router.add_get("/", index)
+    app.router.add_get("/debug/lb", debug_lb)
+    for method in ("GET", "POST", "PUT", "DELETE"):
+        app.router.add_route(method, "/{path:.+}", route_request)
+    app.on_startup.append(_open_session)
+    app.on_cleanup.append(_close_session)
+    return app
+
+
+def unsupported_settings():
+    """Opțiunile LB-ului Flask pe care motorul asyncio nu le implementează."""
+    settings = []
+    if EDGE_CACHE_ENABLED:
+        settings.append("LB_EDGE_CACHE")
+    if COALESCE_ENABLED:
+        settings.append("LB_COALESCE")
+    if ROUTE_POLICIES:
+        settings.append("LB_ROUTE_POLICIES")
+    return settings
+
+
+def run(port):
+    # Refuzăm pornirea în loc să le ignorăm pe tăcute
+    unsupported = unsupported_settings()
+    if unsupported:
+        sys.exit(
+            f"[LB async] LB_ENGINE=asyncio nu suportă {', '.join(unsupported)}; "
+            f"dezactivează-le sau folosește LB_ENGINE=flask"
+        )
+    web.run_app(create_app(), host="0.0.0.0", port=port, access_log=None)
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5000))
+    print(f"--- Load Balancer (asyncio) pornește pe portul {port} ---")
+    run(port)
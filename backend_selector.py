@@ -0,0 +1,254 @@
+# backend_selector.py
+import random
+import threading
+import time
+
+from upstream_pool import UpstreamPool, UpstreamError
+
+STRATEGIES = ("round_robin", "least_outstanding", "ewma", "p2c")
+
+
+class Backend:
+    """Starea văzută de load balancer pentru un server backend."""
+
+    def __init__(self, url):
+        self.url = url
+        self.healthy = True
+        self.outstanding = 0
+        self.ewma_latency = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_fails = 0
+        self.consecutive_oks = 0
+
+        # Circuit breaker: closed -> open (după prea multe eșecuri) ->
+        # half_open (după cooldown, o singură cerere de probă) -> closed
+        self.breaker_state = "closed"
+        self.breaker_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def cost(self):
+        # Latența estimată pentru o cerere nouă: EWMA ponderat cu coada curentă
+        return self.ewma_latency * (self.outstanding + 1)
+
+
+class BackendSelector:
+    """
+    Alege backend-ul pentru fiecare cerere după o strategie configurabilă:
+      - round_robin:       ca înainte, dar sare peste serverele căzute
+      - least_outstanding: serverul cu cele mai puține cereri în curs
+      - ewma:              serverul cu cea mai mică latență medie (EWMA)
+      - p2c:               power-of-two-choices, două servere la întâmplare,
+                           câștigă cel cu costul (EWMA x coadă) mai mic
+
+    Un thread de fundal verifică periodic /ping pe fiecare server. După
+    `fall` eșecuri consecutive serverul este scos din rotație și revine
+    după `rise` răspunsuri reușite.
+
+    Independent de health check, fiecare server are un circuit breaker
+    alimentat de cererile reale: după `breaker_failures` eșecuri consecutive
+    nu mai primește trafic timp de `breaker_cooldown` secunde, apoi o singură
+    cerere de probă decide dacă circuitul se închide la loc.
+    """
+
+    def __init__(
+        self,
+        servers,
+        strategy="p2c",
+        ewma_alpha=0.3,
+        failure_penalty=5.0,
+        health_path="/ping",
+        health_interval=5.0,
+        health_timeout=2.0,
+        fall=2,
+        rise=2,
+        breaker_failures=5,
+        breaker_cooldown=10.0,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Strategie necunoscută: {strategy} (opțiuni: {', '.join(STRATEGIES)})")
+        self.strategy = strategy
+        self.backends = [Backend(url) for url in servers]
+        self.ewma_alpha = ewma_alpha
+        self.failure_penalty = failure_penalty
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.fall = fall
+        self.rise = rise
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+
+        self._lock = threading.Lock()
+        self._rr_index = 0
+        self._health_pools = {
+            b.url: UpstreamPool(b.url, max_size=1, timeout=health_timeout)
+            for b in self.backends
+        }
+        self._health_thread = None
+
+    # ---- selecție ----
+
+    def _breaker_allows(self, backend, now):
+        if backend.breaker_state == "open":
+            if now - backend.opened_at < self.breaker_cooldown:
+                return False
+            backend.breaker_state = "half_open"
+            backend.trial_in_flight = False
+            print(f"[BREAKER] {backend.url} half-open, trimit o cerere de probă")
+        if backend.breaker_state == "half_open":
+            return not backend.trial_in_flight
+        return True
+
+    def _candidates(self, exclude):
+        now = time.monotonic()
+        alive = [
+            b for b in self.backends
+            if b.healthy and b.url not in exclude and self._breaker_allows(b, now)
+        ]
+        if alive:
+            return alive
+        # Toate serverele par căzute: încercăm totuși, e mai bine decât 503 direct
+        return [b for b in self.backends if b.url not in exclude] or self.backends
+
+    def _choose(self, candidates):
+        if self.strategy == "least_outstanding":
+            return min(candidates, key=lambda b: (b.outstanding, b.ewma_latency))
+        if self.strategy == "ewma":
+            return min(candidates, key=lambda b: (b.ewma_latency, b.outstanding))
+        if self.strategy == "p2c":
+            if len(candidates) < 2:
+                return candidates[0]
+            first, second = random.sample(candidates, 2)
+            return first if first.cost() <= second.cost() else second
+
+        self._rr_index = (self._rr_index + 1) % len(candidates)
+        return candidates[self._rr_index]
+
+    def acquire(self, exclude=(), prefer=None):
+        """
+        Alege un backend și îl marchează ca având o cerere în curs. Cu
+        `prefer` (mulțime de URL-uri), alegem dintre acelea dacă vreunul e
+        disponibil.
+        """
+        with self._lock:
+            candidates = self._candidates(exclude)
+            if prefer:
+                candidates = [b for b in candidates if b.url in prefer] or candidates
+            backend = self._choose(candidates)
+            backend.outstanding += 1
+            if backend.breaker_state == "half_open":
+                backend.trial_in_flight = True
+            return backend
+
+    def acquire_url(self, url):
+        """
+        Ca acquire(), dar pentru un backend anume (ex. proprietarul unui
+        shard), fără alternativă: dacă circuitul lui e deschis aruncă
+        UpstreamError, ca cererea să primească 503 imediat.
+        """
+        with self._lock:
+            backend = next(b for b in self.backends if b.url == url)
+            if not self._breaker_allows(backend, time.monotonic()):
+                raise UpstreamError(f"{url}: circuit breaker deschis")
+            backend.outstanding += 1
+            if backend.breaker_state == "half_open":
+                backend.trial_in_flight = True
+            return backend
+
+    def release(self, backend, latency, ok=True):
+        """Închide cererea pornită cu acquire() și actualizează EWMA."""
+        sample = latency if ok else max(latency, self.failure_penalty)
+        with self._lock:
+            backend.outstanding -= 1
+            backend.requests += 1
+            if not ok:
+                backend.failures += 1
+            # Întâi breaker-ul: dacă proba îl închide, EWMA pornește de la zero
+            self._update_breaker(backend, ok)
+            if backend.ewma_latency == 0.0:
+                backend.ewma_latency = sample
+            else:
+                backend.ewma_latency += self.ewma_alpha * (sample - backend.ewma_latency)
+
+    def _reset_latency(self, backend):
+        """
+        Serverul și-a revenit: uităm penalizările din EWMA (altfel costul lui
+        rămâne uriaș și primește prea puțin trafic ca să-l mai coboare) și
+        pornim de la media celorlalte servere. Apelat cu lock-ul luat.
+        """
+        others = [b.ewma_latency for b in self.backends if b is not backend and b.healthy and b.ewma_latency > 0]
+        backend.ewma_latency = sum(others) / len(others) if others else 0.0
+
+    def _update_breaker(self, backend, ok):
+        if self.breaker_failures <= 0:
+            return
+        if ok:
+            if backend.breaker_state != "closed":
+                print(f"[BREAKER] {backend.url} închis la loc")
+                self._reset_latency(backend)
+            backend.breaker_state = "closed"
+            backend.breaker_failures = 0
+            return
+        backend.breaker_failures += 1
+        if backend.breaker_state == "half_open" or (
+            backend.breaker_state == "closed" and backend.breaker_failures >= self.breaker_failures
+        ):
+            backend.breaker_state = "open"
+            backend.opened_at = time.monotonic()
+            print(f"[BREAKER] {backend.url} deschis după {backend.breaker_failures} eșecuri")
+
+    # ---- health checks ----
+
+    def _probe(self, backend):
+        try:
+            status, _, _ = self._health_pools[backend.url].fetch("GET", self.health_path)
+            return status == 200
+        except UpstreamError:
+            return False
+
+    def check_once(self):
+        for backend in self.backends:
+            ok = self._probe(backend)
+            with self._lock:
+                if ok:
+                    backend.consecutive_oks += 1
+                    backend.consecutive_fails = 0
+                    if not backend.healthy and backend.consecutive_oks >= self.rise:
+                        backend.healthy = True
+                        self._reset_latency(backend)
+                        print(f"[HEALTH] {backend.url} a revenit în rotație")
+                else:
+                    backend.consecutive_fails += 1
+                    backend.consecutive_oks = 0
+                    if backend.healthy and backend.consecutive_fails >= self.fall:
+                        backend.healthy = False
+                        print(f"[HEALTH] {backend.url} scos din rotație (nu răspunde la {self.health_path})")
+
+    def _health_loop(self):
+        while True:
+            self.check_once()
+            time.sleep(self.health_interval)
+
+    def start_health_checks(self):
+        if self._health_thread is None and self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "backends": [
+                    {
+                        "backend": b.url,
+                        "healthy": b.healthy,
+                        "outstanding": b.outstanding,
+                        "ewma_latency_ms": round(b.ewma_latency * 1000, 2),
+                        "requests": b.requests,
+                        "failures": b.failures,
+                        "breaker": b.breaker_state,
+                    }
+                    for b in self.backends
+                ],
+            }
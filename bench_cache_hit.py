@@ -0,0 +1,70 @@
+# bench_cache_hit.py
+"""
+Micro-benchmark pentru calea de cache hit din GET /employee/<id>.
+
+Compară CPU-ul per cerere (time.process_time) pentru:
+  - vechi: json.loads pe valoarea din Redis + jsonify + header f-string;
+  - nou:   body-ul JSON din cache trimis ca atare + header precalculat.
+
+Redis-ul e înlocuit cu un dict, ca să măsurăm doar munca din proces.
+Rulare: python bench_cache_hit.py [număr_cereri]
+"""
+import json
+import sys
+import time
+
+from flask import Flask, Response, jsonify, make_response
+
+from employee_cache import encode_json, orjson
+
+DB_NAME, DB_ID, SERVER_PORT = "db1", "1", 5001
+DB_INFO = f"Operat pe DB: {DB_NAME} (Server ID: {DB_ID}, Port: {SERVER_PORT})"
+
+EMPLOYEE = {"id": 42, "name": "Ion Popescu", "position": "Inginer software"}
+OLD_CACHE = {"employee:42": json.dumps(EMPLOYEE)}
+NEW_CACHE = {b"employee:42": encode_json(EMPLOYEE)}
+
+app = Flask(__name__)
+
+
+def old_hit():
+    data = json.loads(OLD_CACHE["employee:42"])
+    response = make_response(jsonify(data), 200)
+    response.headers["X-Database-Info"] = f"Operat pe DB: {DB_NAME} (Server ID: {DB_ID}, Port: {SERVER_PORT})"
+    return response.get_data()
+
+
+def new_hit():
+    response = Response(
+        NEW_CACHE[b"employee:42"],
+        200,
+        headers={"X-Database-Info": DB_INFO},
+        mimetype="application/json",
+    )
+    return response.get_data()
+
+
+def measure(fn, iterations):
+    for _ in range(min(1000, iterations)):
+        fn()
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with app.app_context():
+        old = measure(old_hit, iterations)
+        new = measure(new_hit, iterations)
+
+    print(f"Encoder JSON pe calea de miss: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    print(f"Cereri măsurate: {iterations}")
+    print(f"  vechi (loads + jsonify + f-string): {old * 1e6:8.2f} µs CPU/cerere")
+    print(f"  nou   (bytes din cache ca atare):   {new * 1e6:8.2f} µs CPU/cerere")
+    print(f"  câștig: {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,14 @@ import sys
 import time
 import os
 
+import load_generator
+
 LOAD_BALANCER_URL = os.environ.get("LOAD_BALANCER_URL", "https://lab4pad-production.up.railway.app")
 LINE_SEPARATOR = "-" * 70
 
+# Sesiune comună: păstrează cookie-ul read-your-writes dat de load balancer
+session = requests.Session()
+
 
 def print_header():
     print(LINE_SEPARATOR)
@@ -51,7 +56,7 @@ def send_request(method, path, **kwargs):
     """
     url = f"{LOAD_BALANCER_URL}{path}"
     try:
-        resp = requests.request(method, url, timeout=5, **kwargs)
+        resp = session.request(method, url, timeout=5, **kwargs)
     except requests.exceptions.ConnectionError:
         print(f"[EROARE] Nu mă pot conecta la {LOAD_BALANCER_URL}. Verifică load balancer-ul.")
         return None, None
@@ -171,7 +176,6 @@ def op_delete_employee():
 
 def main():
     print_header()
-    session = requests.Session() 
 
     
     time.sleep(0.5)
@@ -198,4 +202,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # `python client.py bench [opțiuni]`: benchmark neinteractiv, vezi load_generator.py
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        load_generator.main(sys.argv[2:], default_url=LOAD_BALANCER_URL)
+    else:
+        main()
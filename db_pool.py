@@ -0,0 +1,208 @@
+# db_pool.py
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from request_timing import phase
+
+
+class PoolTimeout(Exception):
+    """Nu s-a eliberat nicio conexiune din pool în timpul permis."""
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor care adună timpul interogărilor la faza "sql" a cererii curente."""
+
+    def execute(self, query, vars=None):
+        with phase("sql"):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with phase("sql"):
+            return super().executemany(query, vars_list)
+
+    def fetchone(self):
+        with phase("sql"):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with phase("sql"):
+            return super().fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        with phase("sql"):
+            return super().fetchall()
+
+
+class DatabasePool:
+    """
+    Pool thread-safe de conexiuni PostgreSQL.
+
+    - păstrează între `minconn` și `maxconn` conexiuni deschise;
+    - când toate sunt ocupate, cererea așteaptă cel mult `wait_timeout`
+      secunde o conexiune liberă (timpul de așteptare e măsurat);
+    - la checkout, o conexiune care a stat nefolosită mai mult de
+      `validate_after` secunde e verificată cu `SELECT 1`;
+    - conexiunile închise sau stricate sunt aruncate și înlocuite;
+    - cu `cursor_factory=TimedCursor`, timpul SQL apare în Server-Timing.
+    """
+
+    def __init__(self, db_config, minconn=1, maxconn=10, wait_timeout=5.0, validate_after=30.0, cursor_factory=None):
+        self.db_config = db_config
+        self.cursor_factory = cursor_factory
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.wait_timeout = wait_timeout
+        self.validate_after = validate_after
+
+        self._idle = []  # (conexiune, momentul eliberării)
+        self._size = 0
+        self._cond = threading.Condition()
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+
+        try:
+            for _ in range(minconn):
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+        except psycopg2.Error as e:
+            print(f"[DB POOL] Nu pot deschide conexiunile inițiale: {e}")
+
+    def _connect(self):
+        if self.cursor_factory is not None:
+            conn = psycopg2.connect(cursor_factory=self.cursor_factory, **self.db_config)
+        else:
+            conn = psycopg2.connect(**self.db_config)
+        with self._cond:
+            self.created += 1
+        return conn
+
+    def _is_usable(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.validate_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while not self._idle and self._size >= self.maxconn:
+                waited = True
+                remaining = self.wait_timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"Pool epuizat: {self.maxconn} conexiuni ocupate de peste {self.wait_timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+            if self._idle:
+                conn, idle_since = self._idle.pop()
+            else:
+                conn, idle_since = None, None
+                self._size += 1  # rezervăm locul înainte de connect()
+
+            self.checkouts += 1
+            if waited:
+                elapsed = time.monotonic() - started
+                self.waits += 1
+                self.wait_time_total += elapsed
+                self.wait_time_max = max(self.wait_time_max, elapsed)
+
+        if conn is not None and not self._is_usable(conn, idle_since):
+            self._discard(conn, keep_slot=True)
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def putconn(self, conn, broken=False):
+        if broken or conn.closed:
+            self._discard(conn)
+            return
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn, keep_slot=False):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.discarded += 1
+            if not keep_slot:
+                self._size -= 1
+                self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Folosire: `with pool.connection() as conn:` — commit la final,
+        rollback la excepție, apoi conexiunea se întoarce în pool.
+        """
+        with phase("db_pool"):
+            conn = self.getconn()
+        broken = False
+        try:
+            try:
+                yield conn
+            except BaseException:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            with phase("sql"):
+                conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+
+    def stats(self):
+        with self._cond:
+            in_use = self._size - len(self._idle)
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "min": self.minconn,
+                "max": self.maxconn,
+                "saturation": round(in_use / self.maxconn, 4) if self.maxconn else 0.0,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time_avg_ms": round(self.wait_time_total / self.waits * 1000, 2) if self.waits else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 2),
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "discarded": self.discarded,
+            }
@@ -0,0 +1,191 @@
+# edge_cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedResponse:
+    """Un răspuns complet (status, headere, body) păstrat la marginea LB-ului."""
+
+    def __init__(self, status, headers, body, expires_at, tag):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+        self.tag = tag
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers) + 200
+
+
+class EdgeCache:
+    """
+    Cache LRU + TTL pentru răspunsuri GET, limitat în octeți.
+
+    Fiecare intrare are un `tag` (ID-ul angajatului), ca invalidarea venită
+    pe db_sync_channel să poată șterge exact intrările afectate. Pentru a nu
+    pune în cache un răspuns citit înainte de o invalidare concurentă,
+    apelantul ia un token cu begin() înainte de cererea către backend și îl
+    dă înapoi la put().
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=30.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        # False cât timp nu primim invalidări (Redis căzut): cache-ul e ocolit
+        self.online = True
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key) if self.online else None
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def begin(self):
+        with self._lock:
+            return self._invalidations
+
+    def put(self, key, tag, status, headers, body, token):
+        entry = CachedResponse(status, headers, body, time.monotonic() + self.ttl, tag)
+        if entry.size > self.max_bytes:
+            return False
+        with self._lock:
+            if not self.online or token != self._invalidations:
+                # Între timp a venit o invalidare; răspunsul poate fi vechi
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._tags.setdefault(tag, set()).add(key)
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, tag):
+        with self._lock:
+            self._invalidations += 1
+            for key in self._tags.pop(str(tag), ()):
+                if key in self._entries:
+                    self._remove(key, drop_tag=False)
+                    self.invalidated += 1
+
+    def clear(self, online=None):
+        with self._lock:
+            if online is not None:
+                self.online = online
+            self._invalidations += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key, drop_tag=True):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if drop_tag:
+            keys = self._tags.get(entry.tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[entry.tag]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "online": self.online,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidated": self.invalidated,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def notification_ids(notification):
+    """
+    ID-urile de angajați atinse de o notificare de pe db_sync_channel sau de
+    o confirmare de aplicare de pe db_sync_applied (`ids`).
+    """
+    if isinstance(notification.get("ids"), list):
+        return [str(employee_id) for employee_id in notification["ids"]]
+    payload = notification.get("data")
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        return []
+    return [str(item["id"]) for item in payload if isinstance(item, dict) and "id" in item]
+
+
+def listen_for_invalidations(
+    cache,
+    redis_client,
+    channel="db_sync_channel",
+    applied_channel=None,
+    retry_delay=2.0,
+    label="EDGE CACHE",
+):
+    """
+    Thread de fundal: ascultă notificările insert/update/delete și scoate din
+    cache intrările angajaților modificați. La (re)conectare golim tot cache-ul,
+    fiindcă e posibil să fi pierdut notificări cât timp eram deconectați;
+    până la reconectare cache-ul rămâne ocolit.
+
+    Notificarea pleacă înainte ca replica să aplice scrierea, deci o citire
+    din replică între timp pune la loc rândul vechi. Cu `applied_channel`
+    (db_sync_applied), intrările sunt invalidate din nou după aplicare.
+    """
+    cache.clear(online=False)
+
+    def loop():
+        while True:
+            try:
+                pubsub = redis_client.pubsub()
+                channels = [channel] + ([applied_channel] if applied_channel else [])
+                pubsub.subscribe(*channels)
+                cache.clear(online=True)
+                print(f"[{label}] Abonat la {', '.join(channels)} pentru invalidare")
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        notification = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    for employee_id in notification_ids(notification):
+                        cache.invalidate(employee_id)
+            except Exception as e:
+                print(f"[{label}] Conexiune Redis pierdută: {e}. Reîncerc...")
+                cache.clear(online=False)
+                time.sleep(retry_delay)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,313 @@
+# employee_cache.py
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # orjson e opțional; fără el folosim json din stdlib
+    orjson = None
+
+# Valoarea pusă în Redis pentru un ID inexistent (negative caching)
+NOT_FOUND = b"null"
+
+# Șterge lock-ul doar dacă e încă al nostru: dacă TTL-ul lui a expirat între
+# timp, cheia poate fi deja lock-ul altei cereri
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def encode_json(data):
+    """Serializează direct în bytes, cu orjson dacă e instalat."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+class NearCache:
+    """
+    Cache LRU în memoria procesului, în fața Redis-ului, cu număr maxim de
+    intrări și TTL scurt. Are aceeași interfață de invalidare ca EdgeCache
+    (invalidate / clear(online=...)), deci poate fi ținut la zi de
+    edge_cache.listen_for_invalidations pe db_sync_channel și db_sync_applied.
+    """
+
+    def __init__(self, max_entries=10000, ttl=5.0, negative_ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.online = True
+        self._entries = OrderedDict()  # id -> (date, expiră_la)
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, employee_id):
+        """Întoarce (găsit?, date)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(employee_id) if self.online else None
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[employee_id]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(employee_id)
+            self.hits += 1
+            return True, entry[0]
+
+    def begin(self):
+        with self._lock:
+            return self._invalidations
+
+    def put(self, employee_id, data, token):
+        ttl = self.ttl if data is not None else min(self.ttl, self.negative_ttl)
+        with self._lock:
+            if not self.online or token != self._invalidations:
+                return
+            self._entries[employee_id] = (data, time.monotonic() + ttl)
+            self._entries.move_to_end(employee_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, employee_id):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.pop(int(employee_id), None)
+
+    def clear(self, online=None):
+        with self._lock:
+            if online is not None:
+                self.online = online
+            self._invalidations += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "online": self.online,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class EmployeeCache:
+    """
+    Cache-ul Redis pentru `employee:<id>`. Valorile sunt body-ul JSON final
+    (bytes), deci un hit se trimite clientului așa cum e, fără decodare și
+    re-encodare; clientul Redis trebuie creat cu decode_responses=False.
+
+    Protecție la stampede:
+
+    - 404-urile sunt ținute în cache ca "null", cu un TTL scurt;
+    - TTL-urile au jitter, ca cheile scrise împreună să nu expire împreună;
+    - la miss, doar cererea care ia lock-ul `lock:employee:<id>` citește din
+      DB; celelalte așteaptă puțin valoarea reconstruită și abia apoi merg
+      și ele la DB;
+    - refresh probabilistic anticipat (XFetch): cu cât cheia e mai aproape
+      de expirare și reconstrucția mai scumpă, cu atât e mai probabil ca o
+      cerere să o reîmprospăteze din timp, cât timp ceilalți primesc încă
+      valoarea existentă.
+
+    Opțional, un NearCache în memoria procesului stă în fața Redis-ului.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        ttl=3600,
+        ttl_jitter=0.1,
+        negative_ttl=30,
+        early_refresh_beta=1.0,
+        lock_timeout=5.0,
+        wait_timeout=0.2,
+        poll_interval=0.02,
+        near_cache=None,
+    ):
+        self.redis = redis_client
+        self.near = near_cache
+        self.ttl = ttl
+        self.ttl_jitter = ttl_jitter
+        self.negative_ttl = negative_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._release_lock = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+        # EWMA al timpului de reconstrucție (citire din DB), pentru XFetch
+        self._rebuild_time = 0.01
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "early_refreshes": 0,
+            "lock_waits": 0,
+            "lock_wait_timeouts": 0,
+            "db_loads": 0,
+        }
+
+    @staticmethod
+    def key(employee_id):
+        return f"employee:{employee_id}"
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _jittered(self, ttl):
+        spread = ttl * self.ttl_jitter
+        return max(1, int(ttl + random.uniform(-spread, spread)))
+
+    def _encode(self, data):
+        if data is None:
+            return NOT_FOUND, self._jittered(self.negative_ttl)
+        return encode_json(data), self._jittered(self.ttl)
+
+    @staticmethod
+    def _body(cached):
+        return None if cached == NOT_FOUND else cached
+
+    def _should_refresh_early(self, pttl_ms):
+        if self.early_refresh_beta <= 0 or pttl_ms is None or pttl_ms <= 0:
+            return False
+        gap = -self._rebuild_time * self.early_refresh_beta * math.log(1.0 - random.random())
+        return gap * 1000 >= pttl_ms
+
+    def _rebuild(self, employee_id, loader):
+        self._count("db_loads")
+        started = time.monotonic()
+        data = loader(employee_id)
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._rebuild_time += 0.2 * (elapsed - self._rebuild_time)
+        value, ttl = self._encode(data)
+        self.redis.setex(self.key(employee_id), ttl, value)
+        return self._body(value)
+
+    def _try_lock(self, key):
+        """Tokenul unic al lock-ului dacă l-am luat, altfel None."""
+        token = os.urandom(16).hex()
+        if self.redis.set(f"lock:{key}", token, nx=True, px=int(self.lock_timeout * 1000)):
+            return token
+        return None
+
+    def _unlock(self, key, token):
+        self._release_lock(keys=[f"lock:{key}"], args=[token])
+
+    def get(self, employee_id, loader):
+        """
+        Întoarce body-ul JSON (bytes) al angajatului sau None dacă nu există.
+        `loader(employee_id)` citește din DB (dict sau None) când cache-ul
+        nu ajută.
+        """
+        if self.near is None:
+            return self._get_shared(employee_id, loader)
+
+        found, body = self.near.get(employee_id)
+        if found:
+            return body
+        token = self.near.begin()
+        body = self._get_shared(employee_id, loader)
+        self.near.put(employee_id, body, token)
+        return body
+
+    def _get_shared(self, employee_id, loader):
+        key = self.key(employee_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        cached, pttl = pipe.execute()
+
+        if cached is not None:
+            token = self._try_lock(key) if self._should_refresh_early(pttl) else None
+            if token is not None:
+                self._count("early_refreshes")
+                try:
+                    return self._rebuild(employee_id, loader)
+                finally:
+                    self._unlock(key, token)
+            self._count("negative_hits" if cached == NOT_FOUND else "hits")
+            return self._body(cached)
+
+        self._count("misses")
+        token = self._try_lock(key)
+        if token is not None:
+            try:
+                return self._rebuild(employee_id, loader)
+            finally:
+                self._unlock(key, token)
+
+        # Altcineva reconstruiește cheia: așteptăm scurt rezultatul lui
+        self._count("lock_waits")
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            cached = self.redis.get(key)
+            if cached is not None:
+                return self._body(cached)
+        self._count("lock_wait_timeouts")
+        return self._rebuild(employee_id, loader)
+
+    def get_many(self, employee_ids):
+        """
+        Un singur MGET; întoarce {id: valoare} doar pentru cheile găsite.
+        Valoarea e body-ul JSON sau b"null" pentru un ID inexistent.
+        """
+        values = self.redis.mget([self.key(employee_id) for employee_id in employee_ids])
+        return {
+            employee_id: value
+            for employee_id, value in zip(employee_ids, values)
+            if value is not None
+        }
+
+    def set_many(self, items):
+        """
+        Scrie mai multe intrări {id: date sau None} într-un singur pipeline
+        și întoarce {id: valoare scrisă}.
+        """
+        encoded = {}
+        pipe = self.redis.pipeline(transaction=False)
+        for employee_id, data in items.items():
+            value, ttl = self._encode(data)
+            encoded[employee_id] = value
+            pipe.setex(self.key(employee_id), ttl, value)
+        pipe.execute()
+        return encoded
+
+    def invalidate(self, *employee_ids):
+        if self.near is not None:
+            for employee_id in employee_ids:
+                self.near.invalidate(employee_id)
+        if employee_ids:
+            self.redis.delete(*(self.key(employee_id) for employee_id in employee_ids))
+
+    def stats(self):
+        with self._lock:
+            redis_stats = dict(self.counters)
+            redis_stats["rebuild_time_ms"] = round(self._rebuild_time * 1000, 2)
+        redis_hits = redis_stats["hits"] + redis_stats["negative_hits"]
+        redis_total = redis_hits + redis_stats["misses"]
+        redis_stats["hit_ratio"] = round(redis_hits / redis_total, 4) if redis_total else 0.0
+        return {
+            "near": self.near.stats() if self.near is not None else None,
+            "redis": redis_stats,
+        }
@@ -0,0 +1,151 @@
+# id_allocator.py
+import threading
+
+import redis
+
+
+class IdAllocator:
+    """
+    Alocator hi/lo pentru ID-uri: procesul rezervă din Redis blocuri de
+    `block_size` ID-uri cu un singur INCRBY și le împarte local, sub lock.
+    Toate serverele folosesc același contor, deci blocurile nu se suprapun.
+
+    - când în blocul curent rămân mai puțin de `prefetch_below` ID-uri,
+      următorul bloc e cerut în fundal, ca inserările să nu aștepte după
+      Redis și să mai meargă o vreme chiar dacă Redis-ul e căzut;
+    - la oprire, `release_unused()` pune ID-urile nefolosite într-o listă
+      Redis (`<key>:free`), de unde le reia primul proces care cere un bloc;
+      dacă procesul moare brusc, ID-urile rămase devin simple goluri.
+    """
+
+    def __init__(self, redis_client, key="employee_id_counter", block_size=100, prefetch_below=None):
+        if block_size < 1:
+            raise ValueError("block_size trebuie să fie cel puțin 1")
+        self.redis = redis_client
+        self.key = key
+        self.free_key = f"{key}:free"
+        self.block_size = block_size
+        self.prefetch_below = block_size // 4 if prefetch_below is None else prefetch_below
+
+        self._next = 1
+        self._end = 0  # ultimul ID din blocul curent (inclusiv)
+        self._spare = None  # bloc (început, sfârșit) deja rezervat în fundal
+        self._prefetching = False
+        self._lock = threading.Lock()
+
+        self.issued = 0
+        self.blocks = 0
+        self.recycled_blocks = 0
+        self.prefetch_errors = 0
+
+    def _reserve_block(self):
+        """Un bloc nou: întâi unul eliberat de alt proces, altfel INCRBY."""
+        free = self.redis.lpop(self.free_key)
+        if free is not None:
+            start, end = (int(part) for part in free.split("-"))
+            with self._lock:
+                self.recycled_blocks += 1
+            return start, end
+        end = self.redis.incrby(self.key, self.block_size)
+        with self._lock:
+            self.blocks += 1
+        return end - self.block_size + 1, end
+
+    def _prefetch(self):
+        try:
+            block = self._reserve_block()
+        except redis.RedisError as e:
+            print(f"[ID ALLOCATOR] Nu pot rezerva blocul următor: {e}")
+            with self._lock:
+                self._prefetching = False
+                self.prefetch_errors += 1
+            return
+        with self._lock:
+            self._spare = block
+            self._prefetching = False
+
+    def _maybe_prefetch(self):
+        # Apelat cu self._lock ținut
+        if (
+            self._spare is None
+            and not self._prefetching
+            and self._end - self._next + 1 < self.prefetch_below
+        ):
+            self._prefetching = True
+            threading.Thread(target=self._prefetch, daemon=True).start()
+
+    def next_id(self):
+        with self._lock:
+            if self._next > self._end and self._spare is not None:
+                self._next, self._end = self._spare
+                self._spare = None
+            if self._next <= self._end:
+                employee_id = self._next
+                self._next += 1
+                self.issued += 1
+                self._maybe_prefetch()
+                return employee_id
+
+        # Blocul s-a terminat și nu avem unul de rezervă: îl cerem sincron
+        start, end = self._reserve_block()
+        with self._lock:
+            if self._next <= self._end:
+                # Între timp alt thread a pus un bloc nou; al nostru devine rezervă
+                if self._spare is None:
+                    self._spare = (start, end)
+                else:
+                    self._give_back(start, end)
+            else:
+                self._next, self._end = start, end
+            employee_id = self._next
+            self._next += 1
+            self.issued += 1
+            self._maybe_prefetch()
+            return employee_id
+
+    def allocate(self, count):
+        """
+        `count` ID-uri consecutive, întoarce primul. Din blocul local dacă
+        încap, altfel printr-un INCRBY separat de exact `count`.
+        """
+        with self._lock:
+            if self._end - self._next + 1 >= count:
+                first_id = self._next
+                self._next += count
+                self.issued += count
+                self._maybe_prefetch()
+                return first_id
+        last_id = self.redis.incrby(self.key, count)
+        with self._lock:
+            self.issued += count
+        return last_id - count + 1
+
+    def _give_back(self, start, end):
+        try:
+            self.redis.rpush(self.free_key, f"{start}-{end}")
+        except redis.RedisError as e:
+            print(f"[ID ALLOCATOR] ID-urile {start}-{end} rămân goluri: {e}")
+
+    def release_unused(self):
+        """Returnează în Redis ID-urile rezervate și nefolosite (la oprire)."""
+        with self._lock:
+            ranges = []
+            if self._next <= self._end:
+                ranges.append((self._next, self._end))
+            if self._spare is not None:
+                ranges.append(self._spare)
+            self._next, self._end, self._spare = 1, 0, None
+        for start, end in ranges:
+            self._give_back(start, end)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "block_size": self.block_size,
+                "remaining": max(0, self._end - self._next + 1),
+                "spare": self._spare is not None,
+                "issued": self.issued,
+                "blocks": self.blocks,
+                "recycled_blocks": self.recycled_blocks,
+                "prefetch_errors": self.prefetch_errors,
+            }
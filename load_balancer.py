@@ -1,18 +1,178 @@
 # load_balancer.py
-from flask import Flask, request, send_from_directory
-import requests
-from itertools import cycle
+from flask import Flask, Response, request, send_from_directory, jsonify
 import os
+import re
+import time
+
+import redis
+
+from upstream_pool import UpstreamPool, UpstreamError, end_to_end_headers
+from backend_selector import BackendSelector
+from edge_cache import EdgeCache, listen_for_invalidations
+from single_flight import SingleFlight
+from read_your_writes import SESSION_COOKIE, SESSION_HEADER, ReadYourWrites
+from sharding import ShardRing, ShardRouter, parse_shard_map
+from request_timing import SERVER_TIMING_HEADER, install as install_request_timing, phase
+from sampling_profiler import SamplingProfiler
+from resilience import (
+    IDEMPOTENT_METHODS,
+    ResilientFetcher,
+    RetryBudget,
+    parse_route_policies,
+    policy_for,
+)
 
 app = Flask(__name__)
 
+
+def redis_from_env():
+    """Client Redis pentru notificările ascultate de LB (invalidare, confirmări)."""
+    return redis.Redis(
+        host=os.environ.get("REDIS_HOST", "localhost"),
+        port=int(os.environ.get("REDIS_PORT", 6379)),
+        password=os.environ.get("REDIS_PASSWORD"),
+        db=0,
+    )
+
+
 # === CONFIG BACKEND SERVERS (Railway URLs) ===
 servers_env = os.environ.get(
     "BACKEND_SERVERS",
     "https://server1-production-9ae3.up.railway.app,https://server2-production-00a0.up.railway.app",
 )
 SERVERS = [s.strip() for s in servers_env.split(",") if s.strip()]
-server_pool = cycle(SERVERS)
+
+# Strategia de selecție: round_robin | least_outstanding | ewma | p2c
+LB_STRATEGY = os.environ.get("LB_STRATEGY", "p2c")
+HEALTH_INTERVAL = float(os.environ.get("LB_HEALTH_INTERVAL", 5))
+HEALTH_TIMEOUT = float(os.environ.get("LB_HEALTH_TIMEOUT", 2))
+HEALTH_FALL = int(os.environ.get("LB_HEALTH_FALL", 2))
+HEALTH_RISE = int(os.environ.get("LB_HEALTH_RISE", 2))
+BREAKER_FAILURES = int(os.environ.get("LB_BREAKER_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.environ.get("LB_BREAKER_COOLDOWN", 10))
+
+selector = BackendSelector(
+    SERVERS,
+    strategy=LB_STRATEGY,
+    health_interval=HEALTH_INTERVAL,
+    health_timeout=HEALTH_TIMEOUT,
+    fall=HEALTH_FALL,
+    rise=HEALTH_RISE,
+    breaker_failures=BREAKER_FAILURES,
+    breaker_cooldown=BREAKER_COOLDOWN,
+)
+selector.start_health_checks()
+
+# === CONFIG POOL DE CONEXIUNI KEEP-ALIVE ===
+POOL_SIZE = int(os.environ.get("LB_POOL_SIZE", 10))
+POOL_IDLE_TIMEOUT = float(os.environ.get("LB_POOL_IDLE_TIMEOUT", 30))
+POOL_MAX_REQUESTS = int(os.environ.get("LB_POOL_MAX_REQUESTS", 1000))
+UPSTREAM_TIMEOUT = float(os.environ.get("LB_UPSTREAM_TIMEOUT", 30))
+# Body-urile se transmit în bucăți de cel mult atâția octeți (în ambele sensuri)
+STREAM_CHUNK_SIZE = int(os.environ.get("LB_STREAM_CHUNK_SIZE", 64 * 1024))
+
+upstream_pools = {
+    server: UpstreamPool(
+        server,
+        max_size=POOL_SIZE,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        max_requests=POOL_MAX_REQUESTS,
+        timeout=UPSTREAM_TIMEOUT,
+    )
+    for server in SERVERS
+}
+
+# === CONFIG EDGE CACHE (GET /employee/<id>) ===
+EDGE_CACHE_ENABLED = os.environ.get("LB_EDGE_CACHE", "0") == "1"
+EDGE_CACHE_TTL = float(os.environ.get("LB_EDGE_CACHE_TTL", 30))
+EDGE_CACHE_MAX_BYTES = int(os.environ.get("LB_EDGE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+EMPLOYEE_PATH = re.compile(r"^/employee/(\d+)$")
+
+edge_cache = EdgeCache(max_bytes=EDGE_CACHE_MAX_BYTES, ttl=EDGE_CACHE_TTL)
+
+# Confirmările de aplicare în replică, de la sync_service
+SYNC_APPLIED_CHANNEL = os.environ.get("SYNC_APPLIED_CHANNEL", "db_sync_applied")
+
+if EDGE_CACHE_ENABLED:
+    # Invalidarea vine pe același db_sync_channel pe care publică serverele,
+    # și din nou după ce replica a aplicat scrierea
+    listen_for_invalidations(edge_cache, redis_from_env(), applied_channel=SYNC_APPLIED_CHANNEL)
+
+# === CONFIG READ-YOUR-WRITES (opt-in) ===
+# După o scriere, citirile aceluiași client merg la backend-ul bazei care a
+# primit-o, până când sync_service confirmă că a aplicat-o și în replică.
+RYW_ENABLED = os.environ.get("LB_READ_YOUR_WRITES", "0") == "1"
+RYW_MAX_PIN = float(os.environ.get("LB_RYW_MAX_PIN", 5))
+
+read_your_writes = ReadYourWrites(max_pin=RYW_MAX_PIN)
+
+if RYW_ENABLED:
+    read_your_writes.listen(redis_from_env(), channel=SYNC_APPLIED_CHANNEL)
+
+# === CONFIG SHARDING (opt-in) ===
+# Cu SHARDING=1 fiecare angajat există doar pe serverul care îi deține ID-ul
+# (hash consistent); listele, lookup-ul și bulk PUT/DELETE sunt adunate de la
+# toate shard-urile. LB_SHARD_MAP="db1=<url>,db2=<url>" (implicit db1, db2 în
+# ordinea din BACKEND_SERVERS); numele sunt DB_ID-urile serverelor.
+SHARDING_ENABLED = os.environ.get("SHARDING", "0") == "1"
+SHARD_VNODES = int(os.environ.get("SHARD_VNODES", 64))
+
+shard_router = None
+if SHARDING_ENABLED:
+    shard_urls = parse_shard_map(os.environ.get("LB_SHARD_MAP", ""), SERVERS)
+    shard_router = ShardRouter(
+        ShardRing(list(shard_urls), vnodes=SHARD_VNODES),
+        shard_urls,
+        selector,
+        upstream_pools,
+        # Aceleași limite de paginare ca pe servere
+        page_size=int(os.environ.get("EMPLOYEES_PAGE_SIZE", 100)),
+        max_page_size=int(os.environ.get("EMPLOYEES_MAX_PAGE_SIZE", 1000)),
+    )
+
+# === CONFIG COMASARE GET-URI IDENTICE (single-flight) ===
+# Răspunsurile comasate sunt bufferizate ca să poată fi împărțite.
+COALESCE_ENABLED = os.environ.get("LB_COALESCE", "0") == "1"
+COALESCE_PREFIXES = tuple(
+    p.strip()
+    for p in os.environ.get("LB_COALESCE_PATHS", "/employee/,/employees").split(",")
+    if p.strip()
+)
+COALESCE_WAIT_TIMEOUT = float(os.environ.get("LB_COALESCE_WAIT_TIMEOUT", 5))
+
+single_flight = SingleFlight(wait_timeout=COALESCE_WAIT_TIMEOUT)
+
+# === CONFIG RETRY / HEDGING PE PREFIX DE RUTĂ (opt-in) ===
+# Ex: LB_ROUTE_POLICIES="/employee/:hedge=1,retries=2;/employees:retries=1"
+ROUTE_POLICIES = parse_route_policies(os.environ.get("LB_ROUTE_POLICIES", ""))
+RETRY_BUDGET_RATIO = float(os.environ.get("LB_RETRY_BUDGET_RATIO", 0.2))
+
+resilient = ResilientFetcher(RetryBudget(ratio=RETRY_BUDGET_RATIO))
+
+# === CONFIG SERVER-TIMING / PROFILARE ===
+# Load balancer-ul adaugă `upstream` (până la headerele backend-ului) și
+# `lb` (restul) la Server-Timing-ul primit de la backend; profilarea e ca
+# în servere (LB_PROFILE_MODE=header|all)
+LB_SERVER_TIMING = os.environ.get("LB_SERVER_TIMING", "1") == "1"
+LB_PROFILE_MODE = os.environ.get("LB_PROFILE_MODE", "off")
+LB_PROFILE_DIR = os.environ.get("LB_PROFILE_DIR", "profiles")
+LB_PROFILE_INTERVAL_MS = float(os.environ.get("LB_PROFILE_INTERVAL_MS", 5))
+LB_PROFILE_KEEP = int(os.environ.get("LB_PROFILE_KEEP", 20))
+
+if LB_PROFILE_MODE not in ("off", "header", "all"):
+    raise ValueError(f"LB_PROFILE_MODE necunoscut: {LB_PROFILE_MODE} (opțiuni: off, header, all)")
+profiler = None
+if LB_PROFILE_MODE != "off":
+    profiler = SamplingProfiler(LB_PROFILE_DIR, interval=LB_PROFILE_INTERVAL_MS / 1000, keep=LB_PROFILE_KEEP)
+
+install_request_timing(
+    app,
+    server_timing=LB_SERVER_TIMING,
+    remainder="lb",
+    total=None,
+    profiler=profiler,
+    profile_mode=LB_PROFILE_MODE,
+)
 
 # === CONFIG PENTRU HTML ===
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -35,29 +195,258 @@ def index():
     return send_from_directory(BASE_DIR, HTML_FILE)
 
 
+@app.route("/debug/lb", methods=["GET"])
+def debug_lb():
+    """Statistici interne ale load balancer-ului."""
+    return jsonify({
+        "pools": [pool.stats() for pool in upstream_pools.values()],
+        "selector": selector.stats(),
+        "edge_cache": edge_cache.stats() if EDGE_CACHE_ENABLED else None,
+        "single_flight": single_flight.stats() if COALESCE_ENABLED else None,
+        "route_policies": [policy.as_dict() for policy in ROUTE_POLICIES],
+        "resilience": resilient.stats() if ROUTE_POLICIES else None,
+        "read_your_writes": read_your_writes.stats() if RYW_ENABLED else None,
+        "sharding": shard_router.stats() if SHARDING_ENABLED else None,
+        "profiler": profiler.stats() if profiler is not None else None,
+    })
+
+
 @app.route("/<path:path>", methods=["GET", "POST", "PUT", "DELETE"])
 def route_request(path):
     """
     Orice altă rută /employees, /employee/1 etc merge la unul din servere.
     """
-    server_url = next(server_pool)
+    upstream_path = f"/{path}"
+    if request.query_string:
+        upstream_path += "?" + request.query_string.decode("latin-1")
+    headers = dict(end_to_end_headers(request.headers.items(), drop=("host",)))
+
+    if SHARDING_ENABLED and shard_router.scatters(request.method, f"/{path}"):
+        return sharded_response(path, headers)
+
+    # Clientul are o scriere încă neconfirmată în replică: citirea lui ocolește
+    # cache-ul, comasarea și politicile și merge la backend-ul scrierii.
+    pinned = None
+    if RYW_ENABLED and request.method == "GET":
+        pinned = read_your_writes.backends_for(
+            request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+        )
+
+    employee_match = EMPLOYEE_PATH.match(f"/{path}")
+    if EDGE_CACHE_ENABLED and employee_match and request.method == "GET" and pinned is None:
+        return cached_get(upstream_path, headers, tag=employee_match.group(1))
+    if (
+        COALESCE_ENABLED
+        and request.method == "GET"
+        and pinned is None
+        and f"/{path}".startswith(COALESCE_PREFIXES)
+    ):
+        try:
+            status, resp_headers, data, shared = fetch_get(upstream_path, headers)
+        except UpstreamError as e:
+            return f"Service Unavailable: {e}", 503
+        if shared:
+            resp_headers = resp_headers + [("X-Coalesced", "1")]
+        return Response(data, status, resp_headers)
+
+    policy = policy_for(ROUTE_POLICIES, f"/{path}")
+    if policy is not None and request.method in IDEMPOTENT_METHODS and pinned is None:
+        try:
+            status, resp_headers, data = fetch_with_policy(
+                request.method, upstream_path, headers, request.get_data() or None
+            )
+        except UpstreamError as e:
+            return f"Service Unavailable: {e}", 503
+        invalidate_edge_cache(employee_match, status)
+        return attach_session_token(Response(data, status, resp_headers), resp_headers)
+
+    try:
+        backend = acquire_backend(request.method, f"/{path}", prefer=pinned)
+    except UpstreamError as e:
+        return f"Service Unavailable: {e}", 503
+    server_url = backend.url
     print(f"Load Balancer -> Redirecționare către: {server_url}")
 
+    started = time.monotonic()
     try:
-        resp = requests.request(
-            method=request.method,
-            url=f"{server_url}/{path}",
-            headers={
-                key: value
-                for (key, value) in request.headers
-                if key.lower() != "host"
-            },
-            data=request.get_data(),
-            params=request.args,
+        with phase("upstream"):
+            status, resp_headers, body = upstream_pools[server_url].stream(
+                request.method,
+                upstream_path,
+                headers=headers,
+                body=request_body_chunks(),
+                chunk_size=STREAM_CHUNK_SIZE,
+            )
+    except UpstreamError as e:
+        selector.release(backend, time.monotonic() - started, False)
+        return f"Service Unavailable: {e}", 503
+
+    invalidate_edge_cache(employee_match, status)
+    if RYW_ENABLED:
+        read_your_writes.learn(server_url, resp_headers)
+
+    # Latența e măsurată până la headere; cererea se consideră încheiată
+    # abia când body-ul a fost trimis complet clientului.
+    latency = time.monotonic() - started
+    body.on_close = lambda complete: selector.release(
+        backend, latency, complete and status < 500
+    )
+    resp_headers = end_to_end_headers(resp_headers)
+    response = Response(body, status, resp_headers, direct_passthrough=True)
+    return attach_session_token(response, resp_headers)
+
+
+def acquire_backend(method, path, exclude=(), prefer=None):
+    """
+    Backend-ul pentru o cerere. În modul sharded, /employee/<id> merge doar
+    la proprietarul ID-ului, iar inserările preferă shard-ul tras la sorți
+    de ShardRouter; restul, ca de obicei, prin selector.
+    """
+    if SHARDING_ENABLED:
+        owner_url = shard_router.url_for(path)
+        if owner_url is not None:
+            return selector.acquire_url(owner_url)
+        insert_url = shard_router.insert_url(method, path)
+        if insert_url is not None:
+            prefer = {insert_url}
+    return selector.acquire(exclude, prefer=prefer)
+
+
+def sharded_response(path, headers):
+    """Rută adunată de la toate shard-urile; listele vin în streaming."""
+    try:
+        status, resp_headers, body = shard_router.handle(
+            request.method,
+            f"/{path}",
+            request.query_string.decode("latin-1"),
+            headers,
+            request.get_data(),
         )
-        return resp.content, resp.status_code, resp.headers.items()
-    except requests.exceptions.RequestException as e:
+    except UpstreamError as e:
         return f"Service Unavailable: {e}", 503
+    return Response(body, status, resp_headers)
+
+
+def attach_session_token(response, resp_headers):
+    """După o scriere reușită, dă clientului tokenul read-your-writes."""
+    if not RYW_ENABLED or request.method == "GET" or response.status_code >= 400:
+        return response
+    token = read_your_writes.issue(resp_headers)
+    if token:
+        response.headers[SESSION_HEADER] = token
+        response.set_cookie(
+            SESSION_COOKIE, token, max_age=int(RYW_MAX_PIN) + 1, httponly=True, samesite="Lax"
+        )
+    return response
+
+
+def invalidate_edge_cache(employee_match, status):
+    if EDGE_CACHE_ENABLED and employee_match and request.method != "GET" and status < 400:
+        # Scrierea a trecut prin noi: nu mai așteptăm notificarea din Redis
+        edge_cache.invalidate(employee_match.group(1))
+
+
+def fetch_buffered(method, upstream_path, headers, body=None, exclude=(), tried=None):
+    """
+    Cerere bufferizată către backend-ul ales de selector (altul decât cele
+    din `exclude`; cel ales se adaugă în `tried`).
+    Întoarce (status, headers, body); aruncă UpstreamError.
+    """
+    backend = acquire_backend(method, upstream_path.split("?", 1)[0], exclude)
+    if tried is not None:
+        tried.append(backend.url)
+    print(f"Load Balancer -> Redirecționare către: {backend.url}")
+    started = time.monotonic()
+    ok = False
+    try:
+        with phase("upstream"):
+            status, resp_headers, data = upstream_pools[backend.url].fetch(
+                method, upstream_path, headers=headers, body=body
+            )
+        if RYW_ENABLED:
+            read_your_writes.learn(backend.url, resp_headers)
+        ok = status < 500
+        return status, end_to_end_headers(resp_headers), data
+    finally:
+        selector.release(backend, time.monotonic() - started, ok)
+
+
+def fetch_with_policy(method, upstream_path, headers, body=None):
+    """fetch_buffered cu retry-uri / hedging dacă ruta are o politică."""
+    policy = policy_for(ROUTE_POLICIES, upstream_path)
+    if policy is None:
+        return fetch_buffered(method, upstream_path, headers, body)
+    # Hedging-ul rulează cererile în thread-urile executorului, fără contextul
+    # cererii (deci fără faze); faza de aici le acoperă din thread-ul cererii.
+    # Când fetch_buffered rulează chiar aici, faza lui e imbricată în asta.
+    with phase("upstream"):
+        return resilient.fetch(
+            method,
+            policy,
+            lambda exclude, tried: fetch_buffered(method, upstream_path, headers, body, exclude, tried),
+        )
+
+
+def fetch_get(upstream_path, headers, fetch=None):
+    """
+    GET bufferizat; cu LB_COALESCE=1 cererile identice aflate în zbor
+    (aceeași cale, query și Accept) împart un singur apel către backend.
+    `fetch` înlocuiește apelul implicit și rulează doar în thread-ul care
+    chiar face cererea, nu și în cele care îi primesc rezultatul.
+    Întoarce (status, headers, body, comasat?).
+    """
+    if fetch is None:
+        fetch = lambda: fetch_with_policy("GET", upstream_path, headers)
+    if not COALESCE_ENABLED:
+        return fetch() + (False,)
+    key = (upstream_path, headers.get("Accept", ""))
+    result, shared = single_flight.do(key, fetch)
+    return result + (shared,)
+
+
+def cached_get(upstream_path, headers, tag):
+    """GET servit din edge cache dacă se poate, altfel de la backend."""
+    key = ("GET", upstream_path)
+    cached = edge_cache.get(key)
+    if cached is not None:
+        return Response(cached.body, cached.status, cached.headers + [("X-Cache", "HIT")])
+
+    def fetch_and_cache():
+        # Doar cine face cererea pune în cache, cu tokenul luat înaintea ei:
+        # un thread comasat ar lua tokenul prea târziu și ar putea pune în
+        # cache un răspuns de dinaintea unei invalidări.
+        token = edge_cache.begin()
+        status, resp_headers, data = fetch_with_policy("GET", upstream_path, headers)
+        if status == 200:
+            # Timpii backend-ului țin de cererea asta, nu de HIT-urile de mai târziu
+            cached_headers = [(k, v) for k, v in resp_headers if k.lower() != SERVER_TIMING_HEADER.lower()]
+            edge_cache.put(key, tag, status, cached_headers, data, token)
+        return status, resp_headers, data
+
+    try:
+        status, resp_headers, data, _ = fetch_get(upstream_path, headers, fetch_and_cache)
+    except UpstreamError as e:
+        return f"Service Unavailable: {e}", 503
+    return Response(data, status, resp_headers + [("X-Cache", "MISS")])
+
+
+def request_body_chunks():
+    """
+    Body-ul cererii clientului ca generator de bucăți, fără să-l citim tot
+    în memorie. None dacă cererea nu are body.
+    """
+    chunked = request.headers.get("Transfer-Encoding", "").lower() == "chunked"
+    if not request.content_length and not chunked:
+        return None
+
+    def chunks():
+        while True:
+            chunk = request.stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    return chunks()
 
 
 if __name__ == "__main__":
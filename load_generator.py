@@ -0,0 +1,320 @@
+# load_generator.py
+"""
+Generator de trafic și benchmark prin load balancer.
+
+Mai mulți workeri (thread-uri, fiecare cu sesiunea lui requests) trimit un
+mix configurabil de cereri:
+  - citiri:  GET /employee/<id> (și o parte GET /employees?limit=..);
+  - scrieri: PUT /employee/<id> (și o parte POST /employee).
+ID-urile sunt alese cu distribuție Zipf peste un set de chei (câteva chei
+„fierbinți” primesc majoritatea traficului); --zipf 0 înseamnă uniform.
+
+Cu --rate, cererile sunt programate la intervale fixe (rată totală), iar
+latența se măsoară de la momentul programat, nu de la trimitere: dacă
+sistemul nu ține pasul, așteptarea în coadă intră în latență.
+
+La final se afișează throughput și p50/p95/p99/max pe endpoint și pe
+backend (după header-ul X-Database-Info), iar rezultatele sunt salvate
+ca JSON; --compare <fișier.json> arată diferențele față de o rulare veche.
+
+Rulare: python client.py bench --workers 32 --duration 30 --read-ratio 0.9
+"""
+import argparse
+import bisect
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+
+import requests
+
+DEFAULT_URL = os.environ.get("LOAD_BALANCER_URL", "https://lab4pad-production.up.railway.app")
+RESULTS_DIR = "bench_results"
+SERVER_ID = re.compile(r"Server ID: ([^,)]+)")
+
+
+def parse_args(argv, default_url=DEFAULT_URL):
+    parser = argparse.ArgumentParser(prog="client.py bench", description="Benchmark prin load balancer")
+    parser.add_argument("--url", default=default_url, help="adresa load balancer-ului")
+    parser.add_argument("--workers", type=int, default=16, help="cereri concurente")
+    parser.add_argument("--duration", type=float, default=30, help="secunde măsurate")
+    parser.add_argument("--warmup", type=float, default=2, help="secunde la început, nemăsurate")
+    parser.add_argument("--rate", type=float, default=0, help="cereri/s în total (0 = cât de repede se poate)")
+    parser.add_argument("--read-ratio", type=float, default=0.9, help="fracția de citiri")
+    parser.add_argument("--list-ratio", type=float, default=0.0, help="din citiri, fracția GET /employees")
+    parser.add_argument("--list-limit", type=int, default=50, help="limit pentru GET /employees")
+    parser.add_argument("--insert-ratio", type=float, default=0.1, help="din scrieri, fracția POST /employee")
+    parser.add_argument("--keys", type=int, default=1000, help="numărul de angajați pe care se lucrează")
+    parser.add_argument("--zipf", type=float, default=1.0, help="exponentul Zipf (0 = uniform)")
+    parser.add_argument("--timeout", type=float, default=5, help="timeout per cerere (secunde)")
+    parser.add_argument("--seed", type=int, default=None, help="seed pentru random (rulări reproductibile)")
+    parser.add_argument("--no-create", action="store_true", help="nu crea angajații lipsă din setul de chei")
+    parser.add_argument("--output", default=None, help=f"fișierul JSON (implicit {RESULTS_DIR}/bench-<dată>.json)")
+    parser.add_argument("--compare", default=None, help="rezultatele unei rulări anterioare (JSON)")
+    args = parser.parse_args(argv)
+
+    for name in ("read_ratio", "list_ratio", "insert_ratio"):
+        if not 0 <= getattr(args, name) <= 1:
+            parser.error(f"--{name.replace('_', '-')} trebuie să fie între 0 și 1")
+    if args.workers < 1 or args.keys < 1 or args.duration <= 0:
+        parser.error("--workers, --keys și --duration trebuie să fie pozitive")
+    return args
+
+
+class ZipfKeys:
+    """
+    Alege chei cu probabilitatea proporțională cu 1 / rang^s. Rangurile
+    sunt amestecate, ca cheile fierbinți să nu fie doar ID-urile mici.
+    """
+
+    def __init__(self, keys, s, rng):
+        self.keys = list(keys)
+        rng.shuffle(self.keys)
+        self.cumulative = list(itertools.accumulate(1.0 / rank ** s for rank in range(1, len(self.keys) + 1)))
+
+    def pick(self, rng):
+        index = bisect.bisect_left(self.cumulative, rng.random() * self.cumulative[-1])
+        return self.keys[min(index, len(self.keys) - 1)]
+
+
+def prepare_keys(session, args):
+    """ID-urile existente (cel mult --keys), completate la nevoie prin /employees/bulk."""
+    ids = []
+    after_id = 0
+    while len(ids) < args.keys:
+        resp = session.get(
+            f"{args.url}/employees",
+            params={"after_id": after_id, "limit": min(1000, args.keys - len(ids))},
+            timeout=args.timeout,
+        )
+        resp.raise_for_status()
+        page = [employee["id"] for employee in resp.json()]
+        ids.extend(page)
+        if not page or "X-Next-Cursor" not in resp.headers:
+            break
+        after_id = int(resp.headers["X-Next-Cursor"])
+
+    missing = args.keys - len(ids)
+    if missing > 0 and not args.no_create:
+        print(f"[BENCH] Creez {missing} angajați pentru setul de chei...")
+        for start in range(0, missing, 1000):
+            batch = [
+                {"name": f"Bench {start + i}", "position": "benchmark"}
+                for i in range(min(1000, missing - start))
+            ]
+            resp = session.post(f"{args.url}/employees/bulk", json=batch, timeout=max(args.timeout, 30))
+            resp.raise_for_status()
+            ids.extend(employee["id"] for employee in resp.json())
+        # Lăsăm sync_service să le copieze și în cealaltă bază
+        time.sleep(2)
+    if not ids:
+        raise SystemExit("[BENCH] Nu există angajați pe care să rulez (încearcă fără --no-create)")
+    return ids
+
+
+def backend_name(resp):
+    info = resp.headers.get("X-Database-Info")
+    if not info:
+        return "N/A"
+    match = SERVER_ID.search(info)
+    return match.group(1).strip() if match else info
+
+
+class Worker(threading.Thread):
+    def __init__(self, bench, index):
+        super().__init__(daemon=True)
+        self.bench = bench
+        self.rng = random.Random(None if bench.args.seed is None else bench.args.seed + index)
+        self.session = requests.Session()
+        self.samples = []  # (endpoint, backend, status, latență în secunde)
+
+    def next_request(self):
+        args = self.bench.args
+        if self.rng.random() < args.read_ratio:
+            if self.rng.random() < args.list_ratio:
+                after_id = self.bench.keys.pick(self.rng) - 1
+                return "GET /employees", "GET", f"/employees?after_id={after_id}&limit={args.list_limit}", None
+            employee_id = self.bench.keys.pick(self.rng)
+            return "GET /employee/<id>", "GET", f"/employee/{employee_id}", None
+        payload = {"name": f"Bench {self.rng.randrange(10 ** 6)}", "position": "benchmark"}
+        if self.rng.random() < args.insert_ratio:
+            return "POST /employee", "POST", "/employee", payload
+        employee_id = self.bench.keys.pick(self.rng)
+        return "PUT /employee/<id>", "PUT", f"/employee/{employee_id}", payload
+
+    def run(self):
+        bench = self.bench
+        while True:
+            scheduled = bench.next_slot()
+            if scheduled is None:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            endpoint, method, path, payload = self.next_request()
+            started = time.perf_counter()
+            try:
+                resp = self.session.request(method, f"{bench.args.url}{path}", json=payload, timeout=bench.args.timeout)
+                status, backend = resp.status_code, backend_name(resp)
+            except requests.exceptions.RequestException as e:
+                status, backend = type(e).__name__, "N/A"
+            finished = time.perf_counter()
+
+            if scheduled >= bench.measure_from:
+                # Cu --rate, latența pornește de la momentul programat
+                latency = finished - (scheduled if bench.args.rate else started)
+                self.samples.append((endpoint, backend, status, latency))
+
+
+class Benchmark:
+    def __init__(self, args, keys):
+        self.args = args
+        self.keys = keys
+        self._lock = threading.Lock()
+        self._slots = itertools.count()
+        self.started = self.measure_from = self.deadline = 0.0
+
+    def next_slot(self):
+        """Momentul la care worker-ul trimite următoarea cerere; None la final."""
+        now = time.perf_counter()
+        if self.args.rate:
+            with self._lock:
+                scheduled = self.started + next(self._slots) / self.args.rate
+        else:
+            scheduled = now
+        return scheduled if scheduled < self.deadline else None
+
+    def run(self):
+        workers = [Worker(self, i) for i in range(self.args.workers)]
+        self.started = time.perf_counter()
+        self.measure_from = self.started + self.args.warmup
+        self.deadline = self.measure_from + self.args.duration
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = max(time.perf_counter(), self.deadline) - self.measure_from
+        return [sample for worker in workers for sample in worker.samples], elapsed
+
+
+def percentile(sorted_values, fraction):
+    """Percentila prin metoda nearest-rank."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample[3] for sample in samples)
+    statuses = {}
+    errors = 0
+    for _, _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if not isinstance(status, int) or status >= 500:
+            errors += 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+def group_by(samples, index, elapsed):
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[index], []).append(sample)
+    return {name: summarize(group, elapsed) for name, group in sorted(groups.items())}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(title, groups):
+    print(f"\n{title}")
+    print(f"  {'':<22} {'cereri':>8} {'erori':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, s in groups.items():
+        print(
+            f"  {name:<22} {s['requests']:>8} {s['errors']:>6} {s['throughput_rps']:>9.1f} "
+            f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f}"
+        )
+
+
+def print_comparison(old, new):
+    print(f"\nComparație cu {old.get('revision') or 'rularea anterioară'} ({old.get('started_at')}):")
+    print(f"  {'':<22} {'req/s':>18} {'p99 ms':>20}")
+    rows = [("total", old.get("overall"), new["overall"])]
+    rows += [(name, old.get("endpoints", {}).get(name), s) for name, s in new["endpoints"].items()]
+    for name, before, after in rows:
+        if not before:
+            print(f"  {name:<22} {'(nou)':>18}")
+            continue
+        print(
+            f"  {name:<22} {before['throughput_rps']:>8.1f} -> {after['throughput_rps']:<8.1f}"
+            f" {before['p99_ms']:>9.2f} -> {after['p99_ms']:<9.2f}"
+        )
+
+
+def main(argv=None, default_url=DEFAULT_URL):
+    args = parse_args(argv, default_url)
+    args.url = args.url.rstrip("/")
+
+    with requests.Session() as session:
+        ids = prepare_keys(session, args)
+    keys = ZipfKeys(ids, args.zipf, random.Random(args.seed))
+    print(
+        f"[BENCH] {args.url}: {args.workers} workeri, {args.duration:g}s (+{args.warmup:g}s warmup), "
+        f"rată {args.rate or 'maximă'}, citiri {args.read_ratio:.0%}, {len(ids)} chei, Zipf s={args.zipf:g}"
+    )
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    samples, elapsed = Benchmark(args, keys).run()
+    results = {
+        "started_at": started_at,
+        "revision": git_revision(),
+        "config": {**vars(args), "keys": len(ids)},
+        "duration_s": round(elapsed, 3),
+        "overall": summarize(samples, elapsed),
+        "endpoints": group_by(samples, 0, elapsed),
+        "backends": group_by(samples, 1, elapsed),
+    }
+    del results["config"]["output"], results["config"]["compare"]
+
+    print_table("Pe endpoint:", results["endpoints"])
+    print_table("Pe backend:", results["backends"])
+    print_table("Total:", {"total": results["overall"]})
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n[BENCH] Rezultate salvate în {output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
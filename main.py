@@ -1,8 +1,14 @@
-
 import os
 from load_balancer import app  
 
+# Motorul LB: "flask" (implicit) sau "asyncio" (aiohttp, concurență mare)
+LB_ENGINE = os.environ.get("LB_ENGINE", "flask").lower()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    print(f"--- Load Balancer pornește pe portul {port} (Railway) ---")
-    app.run(host="0.0.0.0", port=port)
+    print(f"--- Load Balancer ({LB_ENGINE}) pornește pe portul {port} (Railway) ---")
+    if LB_ENGINE == "asyncio":
+        from async_load_balancer import run
+        run(port)
+    else:
+        app.run(host="0.0.0.0", port=port)
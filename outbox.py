@@ -0,0 +1,203 @@
+# outbox.py
+import json
+import threading
+import time
+
+import psycopg2
+import redis
+
+from db_pool import PoolTimeout
+
+# Tabelele sunt create de setup_database.py în ambele baze de date
+OUTBOX_TABLE = "sync_outbox"
+SEQUENCE_TABLE = "sync_sequence"
+
+
+def enqueue_notification(cursor, notification, channel="db_sync_channel"):
+    """
+    Pune notificarea în outbox, pe cursorul (și deci în tranzacția) scrierii.
+    Ajunge pe canal doar dacă tranzacția face commit. E ultima instrucțiune
+    din tranzacție, deci clock_timestamp() aproximează momentul commit-ului.
+    Întoarce ID-ul rândului din outbox.
+    """
+    cursor.execute(
+        f"""
+        INSERT INTO {OUTBOX_TABLE} (channel, payload, created_at)
+        VALUES (%s, %s, clock_timestamp())
+        RETURNING id
+        """,
+        (channel, json.dumps(notification)),
+    )
+    return cursor.fetchone()[0]
+
+
+class OutboxRelay:
+    """
+    Thread de fundal care golește outbox-ul în loturi: citește rândurile
+    netrimise (FOR UPDATE SKIP LOCKED, deci pot rula mai multe relay-uri pe
+    aceeași bază), le publică pe Redis într-un singur pipeline și le
+    marchează ca trimise în aceeași tranzacție.
+
+    Fiecare notificare primește la trimitere `seq` (număr de ordine per bază
+    sursă, fără goluri, alocat din `sync_sequence` în aceeași tranzacție) și
+    `origin_ts` (momentul commit-ului scrierii, epoch în secunde), ca
+    sync_service să poată măsura lag-ul și detecta mesajele pierdute, plus
+    `outbox_id`, pe care sync_service îl confirmă după aplicare.
+
+    Livrarea e at-least-once: dacă procesul moare după publish și înainte de
+    commit, lotul se trimite din nou, cu aceleași `seq`. Consumatorii (sync_service, cache-urile)
+    sunt idempotenți. Rândurile trimise se șterg după `retention` secunde.
+
+    Cu `stream` setat, fiecare notificare e adăugată și în Redis Stream-ul
+    respectiv (XADD, plafonat aproximativ la `stream_maxlen` intrări), de
+    unde sync_service o citește durabil; pub/sub-ul rămâne pentru cache-uri.
+    """
+
+    def __init__(
+        self,
+        db_pool,
+        redis_client,
+        batch_size=100,
+        poll_interval=0.5,
+        retry_delay=2.0,
+        retention=3600.0,
+        stream=None,
+        stream_maxlen=1000000,
+    ):
+        self.db_pool = db_pool
+        self.redis = redis_client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.retention = retention
+        self.stream = stream
+        self.stream_maxlen = stream_maxlen
+
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.published = 0
+        self.errors = 0
+        self.last_error = None
+
+    def wake(self):
+        """Apelat după commit, ca notificarea să plece imediat, nu la următorul poll."""
+        self._wakeup.set()
+
+    def relay_once(self):
+        """Trimite un lot; întoarce numărul de notificări publicate."""
+        with self.db_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT id, channel, payload, extract(epoch FROM created_at)
+                    FROM {OUTBOX_TABLE}
+                    WHERE sent_at IS NULL
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    (self.batch_size,),
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    return 0
+
+                # Lock pe rândul contorului: relay-urile de pe aceeași bază
+                # publică pe rând, deci `seq` ajunge în ordine pe canal. Upsert,
+                # ca o bază creată înainte de rândul din setup_database.py să
+                # pornească numerotarea de la 1 în loc să oprească relay-ul.
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SEQUENCE_TABLE} (id, last_seq) VALUES (1, %s)
+                    ON CONFLICT (id) DO UPDATE
+                    SET last_seq = {SEQUENCE_TABLE}.last_seq + EXCLUDED.last_seq
+                    RETURNING last_seq
+                    """,
+                    (len(rows),),
+                )
+                first_seq = cursor.fetchone()[0] - len(rows) + 1
+
+                pipe = self.redis.pipeline(transaction=False)
+                for offset, (outbox_id, channel, payload, origin_ts) in enumerate(rows):
+                    notification = json.loads(payload)
+                    notification["outbox_id"] = outbox_id
+                    notification["seq"] = first_seq + offset
+                    notification["origin_ts"] = float(origin_ts)
+                    payload = json.dumps(notification)
+                    if self.stream:
+                        pipe.xadd(
+                            self.stream,
+                            {"payload": payload},
+                            maxlen=self.stream_maxlen,
+                            approximate=True,
+                        )
+                    pipe.publish(channel, payload)
+                pipe.execute()
+
+                cursor.execute(
+                    f"UPDATE {OUTBOX_TABLE} SET sent_at = now() WHERE id = ANY(%s)",
+                    ([row[0] for row in rows],),
+                )
+
+        with self._lock:
+            self.batches += 1
+            self.published += len(rows)
+        return len(rows)
+
+    def _purge_sent(self):
+        with self.db_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    DELETE FROM {OUTBOX_TABLE}
+                    WHERE sent_at IS NOT NULL
+                      AND sent_at < now() - make_interval(secs => %s)
+                    """,
+                    (self.retention,),
+                )
+
+    def _loop(self):
+        while True:
+            try:
+                # Cât timp loturile vin pline, continuăm fără pauză
+                while self.relay_once() >= self.batch_size:
+                    pass
+                if time.monotonic() - self._last_purge >= self.retention / 10:
+                    self._purge_sent()
+                    self._last_purge = time.monotonic()
+            except (psycopg2.Error, redis.RedisError, PoolTimeout) as e:
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = str(e)
+                print(f"[OUTBOX] Nu pot goli outbox-ul: {e}. Reîncerc...")
+                time.sleep(self.retry_delay)
+                continue
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        pending = None
+        try:
+            with self.db_pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"SELECT count(*) FROM {OUTBOX_TABLE} WHERE sent_at IS NULL")
+                    pending = cursor.fetchone()[0]
+        except (psycopg2.Error, PoolTimeout):
+            pass
+        with self._lock:
+            return {
+                "pending": pending,
+                "batches": self.batches,
+                "published": self.published,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,144 @@
+# read_your_writes.py
+import json
+import re
+import threading
+import time
+
+SESSION_HEADER = "X-Session-Token"
+SESSION_COOKIE = "lb_ryw"
+SYNC_TOKEN_HEADER = "X-Sync-Token"
+
+# "Operat pe DB: db1 (Server ID: db1, Port: 5001)" -> db1
+SERVER_ID = re.compile(r"Server ID: ([\w-]+)")
+
+
+class ReadYourWrites:
+    """
+    Read-your-writes peste replicarea asincronă db1 <-> db2.
+
+    La o scriere, serverul întoarce `X-Sync-Token: <db>:<outbox_id>`; LB-ul
+    îl dă clientului ca token de sesiune (header + cookie) și îl ține ca
+    „neconfirmat”. Cât timp tokenul clientului e neconfirmat, citirile lui
+    merg la un backend legat de baza care a primit scrierea. sync_service
+    confirmă pe `db_sync_applied` după commit în replică, iar de atunci
+    citirile clientului se balansează din nou liber. Dacă confirmarea nu vine
+    (Redis căzut, mesaj pierdut), legătura expiră după `max_pin` secunde.
+
+    Maparea bază -> backend e învățată din headerul X-Database-Info al
+    răspunsurilor.
+    """
+
+    def __init__(self, max_pin=5.0):
+        self.max_pin = max_pin
+        self.online = False
+        self._pending = {}  # token -> expiră_la
+        self._backends = {}  # db -> {url}
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+        self.issued = 0
+        self.confirmed = 0
+        self.expired = 0
+        self.pinned_reads = 0
+
+    def learn(self, url, headers):
+        """Reține pe ce bază operează backend-ul `url`, din headerele unui răspuns."""
+        for name, value in headers:
+            if name.lower() == "x-database-info":
+                match = SERVER_ID.search(value)
+                if match:
+                    with self._lock:
+                        self._backends.setdefault(match.group(1), set()).add(url)
+                return
+
+    def issue(self, headers):
+        """Tokenul de sesiune pentru un răspuns la o scriere, sau None."""
+        sync_token = next(
+            (value for name, value in headers if name.lower() == SYNC_TOKEN_HEADER.lower()),
+            None,
+        )
+        if not sync_token:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._pending[sync_token] = now + self.max_pin
+            self.issued += 1
+            if now - self._last_purge >= self.max_pin:
+                self._purge(now)
+        return sync_token
+
+    def _purge(self, now):
+        expired = [token for token, deadline in self._pending.items() if deadline <= now]
+        for token in expired:
+            del self._pending[token]
+        self.expired += len(expired)
+        self._last_purge = now
+
+    def backends_for(self, session_token):
+        """
+        URL-urile la care trebuie să meargă citirea, sau None dacă tokenul
+        lipsește, a fost confirmat sau a expirat.
+        """
+        if not session_token:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            deadline = self._pending.get(session_token)
+            if deadline is None:
+                return None
+            if deadline <= now:
+                del self._pending[session_token]
+                self.expired += 1
+                return None
+            backends = self._backends.get(session_token.split(":", 1)[0])
+            if not backends:
+                return None
+            self.pinned_reads += 1
+            return set(backends)
+
+    def confirm(self, source_db, outbox_ids):
+        with self._lock:
+            for outbox_id in outbox_ids:
+                if self._pending.pop(f"{source_db}:{outbox_id}", None) is not None:
+                    self.confirmed += 1
+
+    def listen(self, redis_client, channel="db_sync_applied", retry_delay=2.0):
+        """Thread de fundal care primește confirmările de la sync_service."""
+
+        def loop():
+            while True:
+                try:
+                    pubsub = redis_client.pubsub()
+                    pubsub.subscribe(channel)
+                    self.online = True
+                    print(f"[RYW] Abonat la '{channel}' pentru confirmări")
+                    for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        try:
+                            data = json.loads(message["data"])
+                            self.confirm(data["source_db"], data["outbox_ids"])
+                        except (TypeError, ValueError, KeyError):
+                            continue
+                except Exception as e:
+                    # Fără confirmări, tokenurile expiră singure după max_pin
+                    self.online = False
+                    print(f"[RYW] Conexiune Redis pierdută: {e}. Reîncerc...")
+                    time.sleep(retry_delay)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                "online": self.online,
+                "max_pin": self.max_pin,
+                "pending": len(self._pending),
+                "issued": self.issued,
+                "confirmed": self.confirmed,
+                "expired": self.expired,
+                "pinned_reads": self.pinned_reads,
+                "backends": {db: sorted(urls) for db, urls in self._backends.items()},
+            }
@@ -0,0 +1,216 @@
+# replication_metrics.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limitele histogramei de lag (secunde), ca la Prometheus
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LagHistogram:
+    """Histogramă cumulativă pe LAG_BUCKETS plus ultimele `window` valori pentru cuantile."""
+
+    def __init__(self, window=1024):
+        self.counts = [0] * (len(LAG_BUCKETS) + 1)  # ultimul = +Inf
+        self.total = 0.0
+        self.count = 0
+        self.window = window
+        self._recent = []
+        self._next = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(LAG_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+        if len(self._recent) < self.window:
+            self._recent.append(value)
+        else:
+            self._recent[self._next] = value
+            self._next = (self._next + 1) % self.window
+
+    def quantile(self, q):
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _SourceState:
+    def __init__(self):
+        self.last_seq = None
+        self.received = 0
+        self.applied = 0
+        self.failed = 0
+        self.gaps = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.last_applied_seq = 0
+        self.last_origin_ts = None
+        self.lag = LagHistogram()
+
+
+class ReplicationMetrics:
+    """
+    Metrici de replicare per bază sursă, din câmpurile `seq` și `origin_ts`
+    puse de OutboxRelay în notificări:
+
+    - la primire, `seq` e comparat cu ultimul văzut: un salt înainte e un gol
+      (mesaje pierdute), un `seq` deja văzut e duplicat sau reordonat;
+    - după commit în baza țintă, lag-ul = acum - origin_ts intră în
+      histogramă; din ea se calculează p50/p95/p99.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def _source(self, name):
+        state = self._sources.get(name)
+        if state is None:
+            state = self._sources[name] = _SourceState()
+        return state
+
+    def observe_received(self, notifications):
+        with self._lock:
+            for notification in notifications:
+                state = self._source(notification["source_db"])
+                state.received += 1
+                seq = notification.get("seq")
+                if seq is None:
+                    continue
+                if state.last_seq is not None:
+                    if seq > state.last_seq + 1:
+                        state.gaps += 1
+                        state.missing += seq - state.last_seq - 1
+                        print(
+                            f"[Sync Service] Gol de secvență de la '{notification['source_db']}': "
+                            f"{state.last_seq + 1}..{seq - 1} lipsesc"
+                        )
+                    elif seq <= state.last_seq:
+                        state.duplicates += 1
+                        continue
+                state.last_seq = seq
+
+    def observe_applied(self, notifications, failed=()):
+        now = time.time()
+        with self._lock:
+            for index, notification in enumerate(notifications):
+                state = self._source(notification["source_db"])
+                if index in failed:
+                    state.failed += 1
+                    continue
+                state.applied += 1
+                seq = notification.get("seq")
+                if seq is not None:
+                    state.last_applied_seq = max(state.last_applied_seq, seq)
+                origin_ts = notification.get("origin_ts")
+                if origin_ts is not None:
+                    state.lag.observe(max(0.0, now - origin_ts))
+                    state.last_origin_ts = max(state.last_origin_ts or 0.0, origin_ts)
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        now = time.time()
+        with self._lock:
+            sources = {}
+            for name, state in self._sources.items():
+                lag = state.lag
+                sources[name] = {
+                    "received": state.received,
+                    "applied": state.applied,
+                    "failed": state.failed,
+                    "applied_per_sec": round(state.applied / elapsed, 2),
+                    "last_seq": state.last_seq,
+                    "last_applied_seq": state.last_applied_seq,
+                    "gaps": state.gaps,
+                    "missing": state.missing,
+                    "duplicates": state.duplicates,
+                    "lag_p50_ms": _ms(lag.quantile(0.50)),
+                    "lag_p95_ms": _ms(lag.quantile(0.95)),
+                    "lag_p99_ms": _ms(lag.quantile(0.99)),
+                    "lag_avg_ms": _ms(lag.total / lag.count) if lag.count else None,
+                    # Cât de vechi e cel mai nou commit aplicat de la sursa asta
+                    "staleness_ms": _ms(now - state.last_origin_ts) if state.last_origin_ts else None,
+                }
+            return {"uptime_sec": round(elapsed, 1), "sources": sources}
+
+    def prometheus(self):
+        """Aceleași metrici în formatul text Prometheus."""
+        lines = [
+            "# TYPE sync_messages_received_total counter",
+            "# TYPE sync_messages_applied_total counter",
+            "# TYPE sync_messages_failed_total counter",
+            "# TYPE sync_sequence_gaps_total counter",
+            "# TYPE sync_sequence_missing_total counter",
+            "# TYPE sync_sequence_duplicates_total counter",
+            "# TYPE sync_last_applied_seq gauge",
+            "# TYPE sync_staleness_seconds gauge",
+            "# TYPE sync_apply_lag_seconds histogram",
+        ]
+        now = time.time()
+        with self._lock:
+            for name, state in sorted(self._sources.items()):
+                label = f'source="{name}"'
+                lines.append(f"sync_messages_received_total{{{label}}} {state.received}")
+                lines.append(f"sync_messages_applied_total{{{label}}} {state.applied}")
+                lines.append(f"sync_messages_failed_total{{{label}}} {state.failed}")
+                lines.append(f"sync_sequence_gaps_total{{{label}}} {state.gaps}")
+                lines.append(f"sync_sequence_missing_total{{{label}}} {state.missing}")
+                lines.append(f"sync_sequence_duplicates_total{{{label}}} {state.duplicates}")
+                lines.append(f"sync_last_applied_seq{{{label}}} {state.last_applied_seq}")
+                if state.last_origin_ts:
+                    lines.append(f"sync_staleness_seconds{{{label}}} {now - state.last_origin_ts:.6f}")
+                cumulative = 0
+                for bound, count in zip(LAG_BUCKETS + ("+Inf",), state.lag.counts):
+                    cumulative += count
+                    lines.append(f'sync_apply_lag_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"sync_apply_lag_seconds_sum{{{label}}} {state.lag.total:.6f}")
+                lines.append(f"sync_apply_lag_seconds_count{{{label}}} {state.lag.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def start_metrics_server(metrics, port, extra_stats=None):
+    """
+    Server HTTP în fundal: /metrics (Prometheus) și /metrics.json (JSON, cu
+    `extra_stats()` adăugat sub cheia "service").
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = metrics.prometheus().encode()
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                data = metrics.snapshot()
+                if extra_stats is not None:
+                    data["service"] = extra_stats()
+                body = json.dumps(data).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # fără un rând de log pentru fiecare scrape
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"[Sync Service] Metrici pe http://0.0.0.0:{port}/metrics")
+    return server
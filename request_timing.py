@@ -0,0 +1,151 @@
+# request_timing.py
+import contextvars
+import time
+
+import redis
+from flask import g, request
+
+SERVER_TIMING_HEADER = "Server-Timing"
+PROFILE_HEADER = "X-Profile"
+
+# Cronometrul cererii curente; None în thread-urile de fundal, unde fazele
+# nu costă nimic
+_current = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """
+    Timpii pe faze ai unei cereri. Fazele imbricate sunt exclusive: timpul
+    unei faze interioare (ex. SQL-ul loader-ului chemat din cache-ul Redis)
+    e scăzut din faza care o conține, deci suma fazelor nu depășește totalul.
+    """
+
+    __slots__ = ("started", "phases", "_stack")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._stack = []  # timpul fazelor copil, pentru fiecare fază deschisă
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def entries(self, remainder="app", total="total"):
+        """[(nume, secunde)]; `remainder` primește timpul necuprins în faze."""
+        elapsed = time.perf_counter() - self.started
+        entries = list(self.phases.items())
+        if remainder:
+            entries.append((remainder, max(0.0, elapsed - sum(self.phases.values()))))
+        if total:
+            entries.append((total, elapsed))
+        return entries
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "started")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer._stack.append(0.0)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        stack = self.timer._stack
+        self.timer.add(self.name, elapsed - stack.pop())
+        if stack:
+            stack[-1] += elapsed
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name):
+    """`with phase("sql"):` adună durata blocului la faza dată a cererii curente."""
+    timer = _current.get()
+    return _NO_PHASE if timer is None else _Phase(timer, name)
+
+
+def start_request():
+    timer = RequestTimer()
+    _current.set(timer)
+    return timer
+
+
+def current_timer():
+    return _current.get()
+
+
+def format_entries(entries):
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in entries)
+
+
+def merge_server_timing(values, entries):
+    """Valorile Server-Timing primite (de la backend) urmate de ale noastre."""
+    return ", ".join([value for value in values if value] + [format_entries(entries)])
+
+
+class TimedConnection(redis.Connection):
+    """Conexiune Redis care adună timpul de trimitere/răspuns la faza "redis"."""
+
+    def send_packed_command(self, *args, **kwargs):
+        with phase("redis"):
+            return super().send_packed_command(*args, **kwargs)
+
+    def read_response(self, *args, **kwargs):
+        with phase("redis"):
+            return super().read_response(*args, **kwargs)
+
+
+def install(app, server_timing=True, remainder="app", total="total", profiler=None, profile_mode="off"):
+    """
+    Hook-uri Flask: cronometru per cerere, header Server-Timing (adăugat la
+    cel primit de la backend, dacă există) și, cu `profiler`, profilare
+    pentru cererile cu `X-Profile: 1` (profile_mode="header") sau pentru
+    toate (profile_mode="all").
+    """
+
+    @app.before_request
+    def _begin_request_timing():
+        start_request()
+        if profiler is not None and (
+            profile_mode == "all"
+            or (profile_mode == "header" and request.headers.get(PROFILE_HEADER) == "1")
+        ):
+            g.profile = profiler.begin()
+
+    @app.after_request
+    def _finish_request_timing(response):
+        timer = _current.get()
+        if server_timing and timer is not None:
+            response.headers[SERVER_TIMING_HEADER] = merge_server_timing(
+                response.headers.getlist(SERVER_TIMING_HEADER),
+                timer.entries(remainder, total),
+            )
+        profile = g.pop("profile", None)
+        if profile is not None:
+            # La închiderea răspunsului, ca body-urile în streaming să fie incluse
+            label = f"{request.method} {request.path}"
+            response.call_on_close(lambda: profiler.end(profile, label))
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request n-a mai rulat (excepție netratată)
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profiler.end(profile, f"{request.method} {request.path}")
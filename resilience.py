@@ -0,0 +1,256 @@
+# resilience.py
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from upstream_pool import UpstreamError
+
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+
+class RoutePolicy:
+    """Politica de retry/hedging pentru un prefix de rută (ex. /employee/)."""
+
+    def __init__(self, prefix, retries=0, hedge=False, hedge_delay=0.05, hedge_quantile=0.95):
+        self.prefix = prefix
+        self.retries = retries
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.latencies = LatencyWindow()
+
+    def as_dict(self):
+        return {
+            "prefix": self.prefix,
+            "retries": self.retries,
+            "hedge": self.hedge,
+            "hedge_delay_ms": round(self.current_hedge_delay() * 1000, 2),
+            "samples": len(self.latencies),
+        }
+
+    def current_hedge_delay(self):
+        """p95 (configurabil) al latenței rutei; până avem date, valoarea fixă."""
+        value = self.latencies.quantile(self.hedge_quantile)
+        return value if value is not None else self.hedge_delay
+
+
+def parse_route_policies(spec):
+    """
+    Format: "/employee/:hedge=1,retries=2;/employees:retries=1"
+    Chei: retries, hedge (0/1), hedge_delay (secunde), hedge_quantile.
+    """
+    policies = []
+    for chunk in spec.split(";"):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        prefix, _, options = chunk.partition(":")
+        kwargs = {}
+        for option in options.split(","):
+            if "=" not in option:
+                continue
+            name, value = (part.strip() for part in option.split("=", 1))
+            if name == "retries":
+                kwargs["retries"] = int(value)
+            elif name == "hedge":
+                kwargs["hedge"] = value.lower() in ("1", "true", "yes")
+            elif name in ("hedge_delay", "hedge_quantile"):
+                kwargs[name] = float(value)
+            else:
+                raise ValueError(f"Opțiune necunoscută în LB_ROUTE_POLICIES: {name}")
+        policies.append(RoutePolicy(prefix.strip(), **kwargs))
+    # Cel mai lung prefix câștigă
+    return sorted(policies, key=lambda p: len(p.prefix), reverse=True)
+
+
+def policy_for(policies, path):
+    for policy in policies:
+        if path.startswith(policy.prefix):
+            return policy
+    return None
+
+
+class LatencyWindow:
+    """Ultimele `size` latențe reușite, pentru cuantile (p95) aproximative."""
+
+    def __init__(self, size=256, min_samples=20):
+        self.size = size
+        self.min_samples = min_samples
+        self._samples = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, value):
+        with self._lock:
+            if len(self._samples) < self.size:
+                self._samples.append(value)
+            else:
+                self._samples[self._next] = value
+                self._next = (self._next + 1) % self.size
+
+    def quantile(self, q):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RetryBudget:
+    """
+    Buget de retry-uri de tip token bucket: fiecare cerere adaugă `ratio`
+    jetoane (maxim `max_tokens`), fiecare retry sau cerere hedged consumă
+    unul. Astfel retry-urile nu pot depăși ~ratio din trafic și nu
+    amplifică o cădere a backend-urilor.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.rejected = 0
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.spent += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tokens": round(self._tokens, 2),
+                "spent": self.spent,
+                "rejected": self.rejected,
+            }
+
+
+class ResilientFetcher:
+    """
+    Execută cereri bufferizate conform unei RoutePolicy.
+
+    `fetch(exclude, tried)` trimite o cerere către un backend care nu e în
+    `exclude`, adaugă URL-ul backend-ului ales în lista `tried` și întoarce
+    (status, headers, body) sau aruncă UpstreamError.
+    """
+
+    def __init__(self, budget, max_workers=32):
+        self.budget = budget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def fetch(self, method, policy, fetch):
+        self.budget.deposit()
+        tried = []
+        attempts = 0
+        while True:
+            try:
+                if policy.hedge and method == "GET":
+                    result = self._hedged(policy, fetch, tried)
+                else:
+                    result = self._timed(policy, fetch, tuple(tried), tried)
+                error = None
+            except UpstreamError as e:
+                result, error = None, e
+
+            if result is not None and result[0] < 500:
+                return result
+            if (
+                method not in IDEMPOTENT_METHODS
+                or attempts >= policy.retries
+                or not self.budget.withdraw()
+            ):
+                if result is not None:
+                    return result
+                raise error
+            attempts += 1
+            with self._lock:
+                self.retries += 1
+
+    def _timed(self, policy, fetch, exclude, tried):
+        started = time.monotonic()
+        result = fetch(exclude, tried)
+        if result[0] < 500:
+            policy.latencies.add(time.monotonic() - started)
+        return result
+
+    def _hedged(self, policy, fetch, tried):
+        primary_tried = []
+        primary_started = threading.Event()
+
+        def run_primary():
+            primary_started.set()
+            return self._timed(policy, fetch, tuple(tried), primary_tried)
+
+        primary = self._executor.submit(run_primary)
+        # Întârzierea hedge-ului curge de când pornește cererea primară, nu de
+        # când a intrat în coada executorului: sub încărcare, așteptarea în
+        # coadă ar declanșa hedge-uri false exact când sistemul e supraîncărcat.
+        primary_started.wait()
+        try:
+            result = primary.result(timeout=policy.current_hedge_delay())
+            tried.extend(primary_tried)
+            return result
+        except FutureTimeout:
+            pass
+
+        if not self.budget.withdraw():
+            result = primary.result()
+            tried.extend(primary_tried)
+            return result
+
+        with self._lock:
+            self.hedges += 1
+        hedge_tried = []
+        hedge = self._executor.submit(
+            self._timed, policy, fetch, tuple(tried) + tuple(primary_tried), hedge_tried
+        )
+
+        # Primul răspuns reușit câștigă; celălalt termină în fundal și își
+        # eliberează singur conexiunea.
+        pending = {primary, hedge}
+        fallback, error = None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except UpstreamError as e:
+                    error = e
+                    continue
+                if result[0] < 500:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    tried.extend(primary_tried + hedge_tried)
+                    return result
+                fallback = result
+        tried.extend(primary_tried + hedge_tried)
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def stats(self):
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "budget": self.budget.stats(),
+            }
@@ -0,0 +1,133 @@
+# sampling_profiler.py
+import heapq
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class _Profile:
+    __slots__ = ("thread_id", "started", "stacks")
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+
+
+def fold_stack(frame):
+    """Stiva unui frame în formatul "folded" (rădăcina întâi, separat prin ';')."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Profiler prin eșantionare pentru cereri individuale: cât timp există
+    cereri profilate, un thread de fundal citește la fiecare `interval`
+    secunde stiva thread-ului fiecăreia (sys._current_frames) și numără
+    stivele. Costul pentru cererea profilată e aproape nul; cererile
+    neprofilate nu plătesc nimic.
+
+    La final, dacă cererea e printre cele mai lente `keep` profilate până
+    acum, stivele sunt scrise în `output_dir` în formatul "folded"
+    (`a;b;c 12` pe linie), gata pentru flamegraph.pl sau speedscope;
+    fișierul celei ieșite din top e șters.
+    """
+
+    def __init__(self, output_dir="profiles", interval=0.005, keep=20):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.keep = keep
+
+        self._active = {}
+        self._slowest = []  # heap (durată, cale fișier)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.profiled = 0
+        self.written = 0
+        self.samples = 0
+
+    def begin(self):
+        """Începe profilarea thread-ului curent; întoarce profilul pentru end()."""
+        profile = _Profile(threading.get_ident())
+        with self._lock:
+            self._active[profile.thread_id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return profile
+
+    def end(self, profile, label):
+        duration = time.perf_counter() - profile.started
+        with self._lock:
+            if self._active.get(profile.thread_id) is not profile:
+                return  # deja încheiat
+            del self._active[profile.thread_id]
+            self.profiled += 1
+            if not profile.stacks:
+                return
+            if len(self._slowest) >= self.keep and duration <= self._slowest[0][0]:
+                return
+            path = self._path(label, duration)
+            heapq.heappush(self._slowest, (duration, path))
+            dropped = heapq.heappop(self._slowest)[1] if len(self._slowest) > self.keep else None
+            self.written += 1
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path, "w") as f:
+                for stack, count in profile.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            if dropped is not None and os.path.exists(dropped):
+                os.remove(dropped)
+        except OSError as e:
+            print(f"[PROFILER] Nu pot scrie profilul {path}: {e}")
+            return
+        print(f"[PROFILER] {label} ({duration * 1000:.1f} ms) -> {path}")
+
+    def _path(self, label, duration):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        # `profiled` face numele unic chiar pentru cereri identice în aceeași secundă
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{self.profiled}_{slug}_{duration * 1000:.0f}ms.folded"
+        return os.path.join(self.output_dir, name)
+
+    def _loop(self):
+        while True:
+            # Sub lock, ca end() să nu vadă stive modificate după ce a scos profilul
+            with self._lock:
+                active = list(self._active.values())
+                if active:
+                    frames = sys._current_frames()
+                    for profile in active:
+                        frame = frames.get(profile.thread_id)
+                        if frame is not None:
+                            profile.stacks[fold_stack(frame)] += 1
+                    self.samples += len(active)
+                    del frames
+            if not active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "output_dir": self.output_dir,
+                "interval_ms": self.interval * 1000,
+                "active": len(self._active),
+                "profiled": self.profiled,
+                "written": self.written,
+                "samples": self.samples,
+                "slowest_ms": sorted((round(d * 1000, 1) for d, _ in self._slowest), reverse=True),
+            }
@@ -1,9 +1,22 @@
 # server1.py
-from flask import Flask, request, jsonify, make_response
-import psycopg2
+from flask import Flask, Response, request
 import redis
 import json
 import os
+import atexit
+import signal
+import sys
+
+from psycopg2.extras import execute_values
+
+from db_pool import DatabasePool, TimedCursor
+from edge_cache import listen_for_invalidations
+from employee_cache import EmployeeCache, NearCache, encode_json
+from id_allocator import IdAllocator
+from outbox import OutboxRelay, enqueue_notification
+from request_timing import TimedConnection, install as install_request_timing, phase
+from sampling_profiler import SamplingProfiler
+from sharding import ShardRing
 
 
 SERVER_PORT = int(os.environ.get("PORT", 5001))
@@ -24,24 +37,197 @@ REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")  
 
+# TimedConnection: timpul petrecut în Redis apare în Server-Timing
 redis_cache = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    password=REDIS_PASSWORD,
-    db=0,
-    decode_responses=True,
+    connection_pool=redis.ConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        password=REDIS_PASSWORD,
+        db=0,
+        decode_responses=True,
+        connection_class=TimedConnection,
+    )
+)
+
+# Client fără decodare pentru cache: valorile sunt body-uri JSON gata de trimis
+redis_raw = redis.Redis(
+    connection_pool=redis.ConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        password=REDIS_PASSWORD,
+        db=0,
+        connection_class=TimedConnection,
+    )
+)
+
+CACHE_TTL = int(os.environ.get("CACHE_TTL", 3600))
+CACHE_TTL_JITTER = float(os.environ.get("CACHE_TTL_JITTER", 0.1))
+CACHE_NEGATIVE_TTL = int(os.environ.get("CACHE_NEGATIVE_TTL", 30))
+CACHE_EARLY_REFRESH_BETA = float(os.environ.get("CACHE_EARLY_REFRESH_BETA", 1.0))
+
+# Near cache opțional, în memoria procesului, în fața Redis-ului
+NEAR_CACHE_ENABLED = os.environ.get("NEAR_CACHE", "0") == "1"
+NEAR_CACHE_SIZE = int(os.environ.get("NEAR_CACHE_SIZE", 10000))
+NEAR_CACHE_TTL = float(os.environ.get("NEAR_CACHE_TTL", 5))
+
+near_cache = None
+if NEAR_CACHE_ENABLED:
+    near_cache = NearCache(
+        max_entries=NEAR_CACHE_SIZE,
+        ttl=NEAR_CACHE_TTL,
+        negative_ttl=CACHE_NEGATIVE_TTL,
+    )
+    # Scrierile proprii și ale celuilalt server apar pe db_sync_channel; cele
+    # ale celuilalt server sunt invalidate din nou după ce sync_service le-a
+    # aplicat în baza noastră, ca o citire de dinainte să nu rămână în cache
+    listen_for_invalidations(
+        near_cache,
+        redis_cache,
+        applied_channel=os.environ.get("SYNC_APPLIED_CHANNEL", "db_sync_applied"),
+        label="NEAR CACHE",
+    )
+
+employee_cache = EmployeeCache(
+    redis_raw,
+    ttl=CACHE_TTL,
+    ttl_jitter=CACHE_TTL_JITTER,
+    negative_ttl=CACHE_NEGATIVE_TTL,
+    early_refresh_beta=CACHE_EARLY_REFRESH_BETA,
+    near_cache=near_cache,
+)
+
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))
+
+# Paginare keyset pentru GET /employees
+EMPLOYEES_PAGE_SIZE = int(os.environ.get("EMPLOYEES_PAGE_SIZE", 100))
+EMPLOYEES_MAX_PAGE_SIZE = int(os.environ.get("EMPLOYEES_MAX_PAGE_SIZE", 1000))
+NDJSON_FETCH_SIZE = int(os.environ.get("NDJSON_FETCH_SIZE", 500))
+
+# Numărul maxim de rânduri acceptat într-o singură cerere /employees/bulk
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", 10000))
+
+# ID-uri rezervate din Redis câte un bloc o dată (hi/lo), nu INCR per insert
+ID_BLOCK_SIZE = int(os.environ.get("ID_BLOCK_SIZE", 100))
+
+id_allocator = IdAllocator(redis_cache, key="employee_id_counter", block_size=ID_BLOCK_SIZE)
+atexit.register(id_allocator.release_unused)
+
+
+def exit_on_sigterm(signum, frame):
+    """`docker stop` trimite SIGTERM, care altfel oprește procesul fără atexit."""
+    sys.exit(0)
+
+
+# Cu SHARDING=1 serverul păstrează doar angajații ale căror ID-uri îi aparțin
+# pe inelul de hash consistent (același inel ca în load balancer, construit
+# din SHARD_NAMES); ID-urile alocate dar sărite rămân goluri.
+SHARDING_ENABLED = os.environ.get("SHARDING", "0") == "1"
+SHARD_NAMES = [name.strip() for name in os.environ.get("SHARD_NAMES", "db1,db2").split(",") if name.strip()]
+SHARD_VNODES = int(os.environ.get("SHARD_VNODES", 64))
+
+if SHARDING_ENABLED and DB_ID not in SHARD_NAMES:
+    raise ValueError(f"SHARD_NAMES nu conține shard-ul acestui server ({DB_ID})")
+shard_ring = ShardRing(SHARD_NAMES, vnodes=SHARD_VNODES)
+
+
+def next_employee_id():
+    """Următorul ID; în modul sharded, doar ID-uri care aparțin acestui shard."""
+    employee_id = id_allocator.next_id()
+    while SHARDING_ENABLED and shard_ring.owner(employee_id) != DB_ID:
+        employee_id = id_allocator.next_id()
+    return employee_id
+
+
+# Notificările de sync trec prin tabela sync_outbox (aceeași tranzacție cu
+# scrierea); un thread de fundal le publică pe db_sync_channel în loturi.
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 0.5))
+OUTBOX_RETENTION = float(os.environ.get("OUTBOX_RETENTION", 3600))
+
+# SYNC_TRANSPORT=stream: notificările intră și într-un Redis Stream durabil,
+# citit de sync_service printr-un consumer group
+SYNC_TRANSPORT = os.environ.get("SYNC_TRANSPORT", "pubsub")
+SYNC_STREAM = os.environ.get("SYNC_STREAM", "db_sync_stream")
+SYNC_STREAM_MAXLEN = int(os.environ.get("SYNC_STREAM_MAXLEN", 1000000))
+
+# Fiecare răspuns primește `Server-Timing: db_pool;dur=.., sql;dur=..,
+# redis;dur=.., json;dur=.., app;dur=.., total;dur=..` (faze exclusive)
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING", "1") == "1"
+
+# Profilare prin eșantionare: PROFILE_MODE=header profilează cererile cu
+# `X-Profile: 1`, PROFILE_MODE=all pe toate; cele mai lente PROFILE_KEEP
+# ajung în PROFILE_DIR ca stive "folded" (flamegraph.pl / speedscope)
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "off")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 20))
+
+if PROFILE_MODE not in ("off", "header", "all"):
+    raise ValueError(f"PROFILE_MODE necunoscut: {PROFILE_MODE} (opțiuni: off, header, all)")
+profiler = None
+if PROFILE_MODE != "off":
+    profiler = SamplingProfiler(PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000, keep=PROFILE_KEEP)
+
+install_request_timing(app, server_timing=SERVER_TIMING_ENABLED, profiler=profiler, profile_mode=PROFILE_MODE)
+
+db_pool = DatabasePool(
+    DB_CONFIG,
+    minconn=DB_POOL_MIN,
+    maxconn=DB_POOL_MAX,
+    wait_timeout=DB_POOL_TIMEOUT,
+    cursor_factory=TimedCursor,
+)
+
+
+outbox_relay = OutboxRelay(
+    db_pool,
+    redis_cache,
+    batch_size=OUTBOX_BATCH_SIZE,
+    poll_interval=OUTBOX_POLL_INTERVAL,
+    retention=OUTBOX_RETENTION,
+    stream=SYNC_STREAM if SYNC_TRANSPORT == "stream" else None,
+    stream_maxlen=SYNC_STREAM_MAXLEN,
 )
+outbox_relay.start()
 
 
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    """Conexiune din pool; `with get_db_connection() as conn:` o returnează singur."""
+    return db_pool.connection()
+
+
+# Header-ul e constant pe durata procesului, îl construim o singură dată
+DB_INFO = f"Operat pe DB: {DB_NAME} (Server ID: {DB_ID}, Port: {SERVER_PORT})"
+EMPLOYEE_NOT_FOUND_BODY = encode_json({"error": "Employee not found"})
+
+
+def create_raw_response(body, status_code, sync_token=None):
+    """Răspuns dintr-un body JSON deja serializat (bytes), trimis ca atare."""
+    headers = {"X-Database-Info": DB_INFO}
+    if sync_token:
+        # Load balancer-ul îl folosește pentru read-your-writes
+        headers["X-Sync-Token"] = sync_token
+    return Response(
+        body,
+        status_code,
+        headers=headers,
+        mimetype="application/json",
+    )
 
 
-def create_response(data, status_code):
+def create_response(data, status_code, sync_token=None):
     """Helper pentru răspuns JSON + header cu info de DB."""
-    response = make_response(jsonify(data), status_code)
-    response.headers["X-Database-Info"] = f"Operat pe DB: {DB_NAME} (Server ID: {DB_ID}, Port: {SERVER_PORT})"
-    return response
+    with phase("json"):
+        body = encode_json(data)
+    return create_raw_response(body, status_code, sync_token)
+
+
+def make_sync_token(outbox_id):
+    """Baza sursă + ID-ul notificării din outbox; sync_service confirmă aplicarea ei."""
+    return f"{DB_ID}:{outbox_id}" if outbox_id is not None else None
 
 
 @app.route("/ping")
@@ -49,6 +235,33 @@ def ping():
     return {"status": "ok", "message": "server1 este in viata"}, 200
 
 
+@app.route("/debug/pool")
+def debug_pool():
+    return db_pool.stats(), 200
+
+
+@app.route("/debug/cache")
+def debug_cache():
+    return employee_cache.stats(), 200
+
+
+@app.route("/debug/ids")
+def debug_ids():
+    return id_allocator.stats(), 200
+
+
+@app.route("/debug/outbox")
+def debug_outbox():
+    return outbox_relay.stats(), 200
+
+
+@app.route("/debug/profiler")
+def debug_profiler():
+    if profiler is None:
+        return {"mode": PROFILE_MODE}, 200
+    return {"mode": PROFILE_MODE, **profiler.stats()}, 200
+
+
 @app.route("/debug/db")
 def debug_db():
     try:
@@ -76,10 +289,13 @@ def debug_redis():
 
 @app.route("/employee/<int:employee_id>", methods=["GET"])
 def get_employee(employee_id):
-    cache_key = f"employee:{employee_id}"
-    if cached_data := redis_cache.get(cache_key):
-        return create_response(json.loads(cached_data), 200)
+    body = employee_cache.get(employee_id, load_employee)
+    if body is not None:
+        return create_raw_response(body, 200)
+    return create_raw_response(EMPLOYEE_NOT_FOUND_BODY, 404)
+
 
+def load_employee(employee_id):
     with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
@@ -89,45 +305,163 @@ def get_employee(employee_id):
             employee = cursor.fetchone()
 
     if employee:
-        data = {"id": employee[0], "name": employee[1], "position": employee[2]}
-        redis_cache.setex(cache_key, 3600, json.dumps(data))
-        return create_response(data, 200)
-    return create_response({"error": "Employee not found"}, 404)
+        return {"id": employee[0], "name": employee[1], "position": employee[2]}
+    return None
 
 
 @app.route("/employees", methods=["GET"])
 def get_all_employees():
+    """
+    Fără parametri: lista completă, ca înainte.
+    ?after_id=&limit=  -> o pagină (keyset pe id); dacă mai sunt rânduri,
+                          header-ul X-Next-Cursor conține after_id-ul următor.
+    Accept: application/x-ndjson -> rândurile sunt trimise pe măsură ce
+                          vin dintr-un cursor server-side, câte unul pe linie.
+    ?ids=1,2,3         -> căutare în lot, vezi lookup_employees().
+    """
+    if "ids" in request.args:
+        try:
+            ids = [int(i) for i in request.args["ids"].split(",") if i.strip()]
+        except ValueError:
+            return create_response({"error": "ids must be a comma-separated list of integers"}, 400)
+        return lookup_employees(ids)
+
+    try:
+        after_id = int(request.args.get("after_id", 0))
+        limit = request.args.get("limit")
+        limit = int(limit) if limit else None
+    except ValueError:
+        return create_response({"error": "after_id and limit must be integers"}, 400)
+
+    paginated = "after_id" in request.args or limit is not None
+    if paginated:
+        limit = max(1, min(limit or EMPLOYEES_PAGE_SIZE, EMPLOYEES_MAX_PAGE_SIZE))
+
+    sql = "SELECT id, name, position FROM employees WHERE id > %s ORDER BY id"
+    params = [after_id]
+    if paginated:
+        # Un rând în plus ne spune dacă există o pagină următoare
+        sql += " LIMIT %s"
+        params.append(limit + 1)
+
+    wants_ndjson = (
+        request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+        == "application/x-ndjson"
+    )
+    if wants_ndjson:
+        response = Response(stream_employees_ndjson(sql, params, limit), mimetype="application/x-ndjson")
+        response.headers["X-Database-Info"] = DB_INFO
+        return response
+
     employees_list = []
     with get_db_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT id, name, position FROM employees ORDER BY id")
+            cursor.execute(sql, params)
             for row in cursor.fetchall():
                 employees_list.append(
                     {"id": row[0], "name": row[1], "position": row[2]}
                 )
-    return create_response(employees_list, 200)
+
+    response = create_response(employees_list[:limit] if paginated else employees_list, 200)
+    if paginated and len(employees_list) > limit:
+        response.headers["X-Next-Cursor"] = str(employees_list[limit - 1]["id"])
+    return response
+
+
+@app.route("/employees/lookup", methods=["POST"])
+def lookup_employees_post():
+    """Varianta POST a lui GET /employees?ids=, pentru liste lungi de ID-uri."""
+    body = request.get_json(silent=True)
+    ids = body.get("ids") if isinstance(body, dict) else body
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return create_response({"error": "Body must be a list of ids (or {\"ids\": [...]})"}, 400)
+    return lookup_employees(ids)
+
+
+def lookup_employees(ids):
+    """
+    Întoarce angajații cu ID-urile cerute, în ordinea cerută (null pentru
+    cei inexistenți): un singur MGET în Redis, un singur SELECT ... = ANY
+    pentru ce lipsește din cache și un singur pipeline de SETEX pentru
+    a pune în cache rândurile citite din DB.
+    """
+    if not ids:
+        return create_response({"error": "No ids given"}, 400)
+    if len(ids) > BULK_MAX_ITEMS:
+        return create_response({"error": f"At most {BULK_MAX_ITEMS} ids per lookup"}, 400)
+
+    unique_ids = list(dict.fromkeys(ids))
+    # Valorile din cache sunt deja JSON ("null" pentru ID-uri inexistente),
+    # deci răspunsul se asamblează direct din bytes.
+    found = employee_cache.get_many(unique_ids)
+    missing = [employee_id for employee_id in unique_ids if employee_id not in found]
+
+    if missing:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, name, position FROM employees WHERE id = ANY(%s)",
+                    (missing,),
+                )
+                rows = cursor.fetchall()
+
+        loaded = dict.fromkeys(missing)
+        for row in rows:
+            loaded[row[0]] = {"id": row[0], "name": row[1], "position": row[2]}
+        found.update(employee_cache.set_many(loaded))
+
+    body = b"[" + b",".join(found[employee_id] for employee_id in ids) + b"]"
+    return create_raw_response(body, 200)
+
+
+def stream_employees_ndjson(sql, params, limit=None):
+    """
+    Generator NDJSON peste un cursor server-side (named cursor): Postgres
+    trimite rândurile în loturi de NDJSON_FETCH_SIZE, deci memoria rămâne
+    constantă indiferent de mărimea tabelei. Dacă `limit` e dat, ultima
+    linie este {"next_cursor": ...} când mai există rânduri.
+    """
+    sent = 0
+    last_id = None
+    with get_db_connection() as conn:
+        with conn.cursor(name="employees_ndjson") as cursor:
+            cursor.itersize = NDJSON_FETCH_SIZE
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(NDJSON_FETCH_SIZE):
+                lines = []
+                for row in rows:
+                    if limit is not None and sent == limit:
+                        lines.append(json.dumps({"next_cursor": str(last_id)}) + "\n")
+                        break
+                    lines.append(json.dumps({"id": row[0], "name": row[1], "position": row[2]}) + "\n")
+                    last_id = row[0]
+                    sent += 1
+                yield "".join(lines)
 
 
 @app.route("/employee", methods=["POST"])
 def add_employee():
     data = request.get_json()
-    employee_id = redis_cache.incr("employee_id_counter")
+    employee_id = next_employee_id()
 
+    new_data = {"id": employee_id, "name": data["name"], "position": data["position"]}
+    notification = {
+        "operation": "insert",
+        "data": new_data,
+        "source_db": DB_ID,   # <- IMPORTANT: db1 logic
+    }
     with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO employees (id, name, position) VALUES (%s, %s, %s)",
                 (employee_id, data["name"], data["position"]),
             )
+            outbox_id = enqueue_notification(cursor, notification)
+    outbox_relay.wake()
 
-    new_data = {"id": employee_id, "name": data["name"], "position": data["position"]}
-    notification = {
-        "operation": "insert",
-        "data": new_data,
-        "source_db": DB_ID,   # <- IMPORTANT: db1 logic
-    }
-    redis_cache.publish("db_sync_channel", json.dumps(notification))
-    return create_response(new_data, 201)
+    # Poate exista o intrare negativă ("null") pentru acest ID
+    employee_cache.invalidate(employee_id)
+    return create_response(new_data, 201, make_sync_token(outbox_id))
 
 
 @app.route("/employee/<int:employee_id>", methods=["PUT"])
@@ -145,19 +479,21 @@ def update_employee(employee_id):
                     {"error": "Employee not found to update"}, 404
                 )
 
-    updated_data = {
-        "id": employee_id,
-        "name": data["name"],
-        "position": data["position"],
-    }
-    notification = {
-        "operation": "update",
-        "data": updated_data,
-        "source_db": DB_ID,
-    }
-    redis_cache.publish("db_sync_channel", json.dumps(notification))
-    redis_cache.delete(f"employee:{employee_id}")
-    return create_response(updated_data, 200)
+            updated_data = {
+                "id": employee_id,
+                "name": data["name"],
+                "position": data["position"],
+            }
+            notification = {
+                "operation": "update",
+                "data": updated_data,
+                "source_db": DB_ID,
+            }
+            outbox_id = enqueue_notification(cursor, notification)
+    outbox_relay.wake()
+
+    employee_cache.invalidate(employee_id)
+    return create_response(updated_data, 200, make_sync_token(outbox_id))
 
 
 @app.route("/employee/<int:employee_id>", methods=["DELETE"])
@@ -170,16 +506,165 @@ def delete_employee(employee_id):
                     {"error": "Employee not found to delete"}, 404
                 )
 
+            notification = {
+                "operation": "delete",
+                "data": {"id": employee_id},
+                "source_db": DB_ID,
+            }
+            outbox_id = enqueue_notification(cursor, notification)
+    outbox_relay.wake()
+
+    employee_cache.invalidate(employee_id)
+    return create_response({"success": True, "deleted_id": employee_id}, 200, make_sync_token(outbox_id))
+
+
+# ---- BULK: o singură tranzacție și o singură notificare per lot ----
+
+def bulk_items(required_fields):
+    """Body-ul unei cereri bulk: listă de obiecte cu câmpurile cerute."""
+    items = request.get_json(silent=True)
+    if isinstance(items, dict):
+        items = items.get("employees")
+    if not isinstance(items, list) or not items:
+        return None, "Body must be a non-empty JSON list"
+    if len(items) > BULK_MAX_ITEMS:
+        return None, f"At most {BULK_MAX_ITEMS} items per bulk request"
+    for item in items:
+        if not isinstance(item, dict) or any(field not in item for field in required_fields):
+            return None, f"Every item needs the fields: {', '.join(required_fields)}"
+    return items, None
+
+
+@app.route("/employees/bulk", methods=["POST"])
+def bulk_add_employees():
+    items, error = bulk_items(("name", "position"))
+    if error:
+        return create_response({"error": error}, 400)
+
+    if SHARDING_ENABLED:
+        # Doar ID-uri proprii, deci nu neapărat consecutive
+        ids = [next_employee_id() for _ in items]
+    else:
+        # ID-uri consecutive pentru tot lotul, din blocul local sau un singur INCRBY
+        first_id = id_allocator.allocate(len(items))
+        ids = range(first_id, first_id + len(items))
+    rows = [(employee_id, item["name"], item["position"]) for employee_id, item in zip(ids, items)]
+    new_data = [{"id": row[0], "name": row[1], "position": row[2]} for row in rows]
     notification = {
-        "operation": "delete",
-        "data": {"id": employee_id},
+        "operation": "insert",
+        "data": new_data,
         "source_db": DB_ID,
     }
-    redis_cache.publish("db_sync_channel", json.dumps(notification))
-    redis_cache.delete(f"employee:{employee_id}")
-    return create_response({"success": True, "deleted_id": employee_id}, 200)
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                "INSERT INTO employees (id, name, position) VALUES %s",
+                rows,
+                page_size=len(rows),
+            )
+            outbox_id = enqueue_notification(cursor, notification)
+    outbox_relay.wake()
+
+    employee_cache.invalidate(*(row[0] for row in rows))
+    return create_response(new_data, 201, make_sync_token(outbox_id))
+
+
+@app.route("/employees/bulk", methods=["PUT"])
+def bulk_update_employees():
+    items, error = bulk_items(("id", "name", "position"))
+    if not error and not all(isinstance(item["id"], int) for item in items):
+        error = "Every id must be an integer"
+    if not error:
+        # Cu id-uri repetate, rândul final ar depinde de ordinea din VALUES
+        seen, duplicates = set(), set()
+        for item in items:
+            (duplicates if item["id"] in seen else seen).add(item["id"])
+        if duplicates:
+            error = f"Duplicate ids: {', '.join(str(i) for i in sorted(duplicates))}"
+    if error:
+        return create_response({"error": error}, 400)
+
+    outbox_id = None
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            updated_ids = execute_values(
+                cursor,
+                """
+                UPDATE employees AS e
+                SET name = v.name, position = v.position
+                FROM (VALUES %s) AS v(id, name, position)
+                WHERE e.id = v.id
+                RETURNING e.id
+                """,
+                [(item["id"], item["name"], item["position"]) for item in items],
+                template="(%s::integer, %s, %s)",
+                page_size=len(items),
+                fetch=True,
+            )
+
+            updated_ids = {row[0] for row in updated_ids}
+            updated_data = [
+                {"id": item["id"], "name": item["name"], "position": item["position"]}
+                for item in items
+                if item["id"] in updated_ids
+            ]
+            if updated_data:
+                notification = {
+                    "operation": "update",
+                    "data": updated_data,
+                    "source_db": DB_ID,
+                }
+                outbox_id = enqueue_notification(cursor, notification)
+
+    if updated_data:
+        outbox_relay.wake()
+        employee_cache.invalidate(*updated_ids)
+
+    return create_response({
+        "updated": updated_data,
+        "not_found": [item["id"] for item in items if item["id"] not in updated_ids],
+    }, 200, make_sync_token(outbox_id))
+
+
+@app.route("/employees/bulk", methods=["DELETE"])
+def bulk_delete_employees():
+    body = request.get_json(silent=True)
+    ids = body.get("ids") if isinstance(body, dict) else body
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        return create_response({"error": "Body must be a non-empty list of ids (or {\"ids\": [...]})"}, 400)
+    if len(ids) > BULK_MAX_ITEMS:
+        return create_response({"error": f"At most {BULK_MAX_ITEMS} items per bulk request"}, 400)
+
+    outbox_id = None
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM employees WHERE id = ANY(%s) RETURNING id",
+                (ids,),
+            )
+            deleted_ids = sorted(row[0] for row in cursor.fetchall())
+            if deleted_ids:
+                notification = {
+                    "operation": "delete",
+                    "data": [{"id": employee_id} for employee_id in deleted_ids],
+                    "source_db": DB_ID,
+                }
+                outbox_id = enqueue_notification(cursor, notification)
+
+    if deleted_ids:
+        outbox_relay.wake()
+        employee_cache.invalidate(*deleted_ids)
+
+    return create_response({
+        "success": True,
+        "deleted_ids": deleted_ids,
+        "not_found": sorted(set(ids) - set(deleted_ids)),
+    }, 200, make_sync_token(outbox_id))
 
 
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
     print(f"--- Server 1 pornește pe portul {SERVER_PORT} ---")
     app.run(host="0.0.0.0", port=SERVER_PORT)
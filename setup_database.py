@@ -71,12 +71,154 @@ def setup_databases():
                 cursor.execute(
                     f"GRANT ALL PRIVILEGES ON TABLE employees TO {APP_USER};"
                 )
+                # Momentul ultimei scrieri a rândului; sync_service copiază aici
+                # momentul de pe baza sursă, iar anti_entropy rezolvă
+                # conflictele după el (last-writer-wins)
+                cursor.execute(
+                    """
+                    ALTER TABLE employees
+                    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+                """
+                )
+                # Un UPDATE care nu setează explicit updated_at îl primește automat
+                cursor.execute(
+                    """
+                    CREATE OR REPLACE FUNCTION employees_touch() RETURNS trigger AS $$
+                    BEGIN
+                        IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+                            NEW.updated_at := clock_timestamp();
+                        END IF;
+                        RETURN NEW;
+                    END;
+                    $$ LANGUAGE plpgsql;
+                """
+                )
+                cursor.execute("DROP TRIGGER IF EXISTS employees_touch ON employees;")
+                cursor.execute(
+                    """
+                    CREATE TRIGGER employees_touch BEFORE UPDATE ON employees
+                    FOR EACH ROW EXECUTE FUNCTION employees_touch();
+                """
+                )
+
+                # Bucățile de câte 1024 de ID-uri scrise de la ultima trecere
+                # anti_entropy (DIRTY_CHUNK_SIZE acolo); doar ele sunt recomparate
+                print(f"  - Creare tabelă 'employees_dirty'...")
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS employees_dirty (
+                        chunk BIGINT PRIMARY KEY
+                    );
+                """
+                )
+                cursor.execute(
+                    """
+                    CREATE OR REPLACE FUNCTION employees_mark_dirty() RETURNS trigger AS $$
+                    BEGIN
+                        INSERT INTO employees_dirty (chunk)
+                        VALUES (COALESCE(NEW.id, OLD.id) / 1024)
+                        ON CONFLICT (chunk) DO NOTHING;
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql;
+                """
+                )
+                cursor.execute("DROP TRIGGER IF EXISTS employees_mark_dirty ON employees;")
+                cursor.execute(
+                    """
+                    CREATE TRIGGER employees_mark_dirty
+                    AFTER INSERT OR UPDATE OR DELETE ON employees
+                    FOR EACH ROW EXECUTE FUNCTION employees_mark_dirty();
+                """
+                )
+                cursor.execute(
+                    f"GRANT ALL PRIVILEGES ON TABLE employees_dirty TO {APP_USER};"
+                )
+
+                # Tombstone per ID șters, păstrat: sync_service nu readuce un
+                # rând cu un insert mai vechi decât ștergerea, iar anti_entropy
+                # nu îl recopiază pe baza unde a fost șters
+                print(f"  - Creare tabelă 'employees_deleted'...")
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS employees_deleted (
+                        id BIGINT PRIMARY KEY,
+                        deleted_at TIMESTAMPTZ NOT NULL
+                    );
+                """
+                )
+                cursor.execute(
+                    """
+                    CREATE OR REPLACE FUNCTION employees_tombstone() RETURNS trigger AS $$
+                    BEGIN
+                        INSERT INTO employees_deleted (id, deleted_at)
+                        VALUES (OLD.id, clock_timestamp())
+                        ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql;
+                """
+                )
+                cursor.execute("DROP TRIGGER IF EXISTS employees_tombstone ON employees;")
+                cursor.execute(
+                    """
+                    CREATE TRIGGER employees_tombstone AFTER DELETE ON employees
+                    FOR EACH ROW EXECUTE FUNCTION employees_tombstone();
+                """
+                )
+                cursor.execute(
+                    f"GRANT ALL PRIVILEGES ON TABLE employees_deleted TO {APP_USER};"
+                )
+
                 cursor.execute(
                     "SELECT 1 FROM pg_class WHERE relname='employees_id_seq';"
                 )
                 cursor.execute(
                     f"GRANT USAGE, SELECT ON SEQUENCE employees_id_seq TO {APP_USER};"
                 )
+
+                print(f"  - Creare tabelă 'sync_outbox'...")
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS sync_outbox (
+                        id BIGSERIAL PRIMARY KEY,
+                        channel VARCHAR(100) NOT NULL,
+                        payload TEXT NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                        sent_at TIMESTAMPTZ
+                    );
+                """
+                )
+                # Relay-ul caută doar rândurile netrimise
+                cursor.execute(
+                    """
+                    CREATE INDEX IF NOT EXISTS sync_outbox_pending_idx
+                    ON sync_outbox (id) WHERE sent_at IS NULL;
+                """
+                )
+                cursor.execute(
+                    f"GRANT ALL PRIVILEGES ON TABLE sync_outbox TO {APP_USER};"
+                )
+                cursor.execute(
+                    f"GRANT USAGE, SELECT ON SEQUENCE sync_outbox_id_seq TO {APP_USER};"
+                )
+
+                # Un singur rând: ultimul număr de ordine trimis de pe baza asta
+                print(f"  - Creare tabelă 'sync_sequence'...")
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS sync_sequence (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        last_seq BIGINT NOT NULL
+                    );
+                """
+                )
+                cursor.execute(
+                    "INSERT INTO sync_sequence (id, last_seq) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;"
+                )
+                cursor.execute(
+                    f"GRANT ALL PRIVILEGES ON TABLE sync_sequence TO {APP_USER};"
+                )
     print("\n Setup-ul bazelor de date a fost finalizat cu succes!")
 
 
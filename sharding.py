@@ -0,0 +1,400 @@
+# sharding.py
+import bisect
+import hashlib
+import heapq
+import json
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from upstream_pool import UpstreamError, end_to_end_headers
+
+EMPLOYEE_PATH = re.compile(r"^/employee/(\d+)$")
+
+
+def _hash(value):
+    # Același rezultat în toate procesele (spre deosebire de hash() din Python)
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class ShardRing:
+    """
+    Inel de hash consistent peste numele shard-urilor (DB_ID-urile
+    serverelor). Fiecare shard are `vnodes` puncte pe inel; un ID aparține
+    primului punct de după hash-ul lui. Cu un shard în plus se mută doar
+    aproximativ 1/N din chei. LB-ul și serverele construiesc același inel
+    din aceleași nume, deci cad de acord asupra proprietarului fără să
+    comunice.
+    """
+
+    def __init__(self, shards, vnodes=64):
+        if not shards:
+            raise ValueError("Inelul are nevoie de cel puțin un shard")
+        points = sorted(
+            (_hash(f"{shard}#{index}"), shard) for shard in shards for index in range(vnodes)
+        )
+        self.shards = sorted(set(shards))
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def owner(self, key):
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+    def group(self, keys):
+        """{shard: [chei]}, fără duplicate, în ordinea primei apariții."""
+        groups = {}
+        for key in dict.fromkeys(keys):
+            groups.setdefault(self.owner(key), []).append(key)
+        return groups
+
+
+def parse_shard_map(value, servers):
+    """
+    "db1=http://server1:5001,db2=http://server2:5002" -> {shard: URL}.
+    Gol: db1, db2, ... în ordinea din BACKEND_SERVERS.
+    """
+    if not value.strip():
+        return {f"db{index + 1}": url for index, url in enumerate(servers)}
+    shard_map = {}
+    for part in value.split(","):
+        name, sep, url = part.partition("=")
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f"Intrare invalidă în harta de shard-uri: {part!r}")
+        shard_map[name.strip()] = url.strip()
+    unknown = set(shard_map.values()) - set(servers)
+    if unknown:
+        raise ValueError(f"Shard-uri fără backend în BACKEND_SERVERS: {', '.join(sorted(unknown))}")
+    return shard_map
+
+
+class ShardRouter:
+    """
+    Rutarea load balancer-ului în modul sharded:
+
+    - /employee/<id> merge la serverul care deține ID-ul (`url_for`);
+    - GET /employees e cerut tuturor shard-urilor ca NDJSON, iar fluxurile
+      sunt interclasate după ID (heapq.merge) și trimise mai departe pe
+      măsură ce sosesc; paginarea keyset (after_id/limit) se aplică peste
+      rezultatul interclasat;
+    - lookup-ul după ID-uri și bulk PUT/DELETE sunt împărțite pe shard-uri,
+      trimise în paralel și reasamblate în ordinea cererii.
+
+    Cererile pe care nu le putem împărți (body sau parametri invalizi) merg
+    întregi la un singur shard, care întoarce eroarea obișnuită.
+    """
+
+    def __init__(
+        self,
+        ring,
+        shard_urls,
+        selector,
+        pools,
+        page_size=100,
+        max_page_size=1000,
+        max_workers=8,
+    ):
+        self.ring = ring
+        self.shard_urls = shard_urls
+        self.selector = selector
+        self.pools = pools
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+        self.routed = 0
+        self.scattered = 0
+
+    def url_for(self, path):
+        """URL-ul proprietarului pentru /employee/<id>, altfel None."""
+        match = EMPLOYEE_PATH.match(path)
+        if match is None:
+            return None
+        self.routed += 1
+        return self.shard_urls[self.ring.owner(int(match.group(1)))]
+
+    def insert_url(self, method, path):
+        """
+        Pentru inserări (ID-ul încă nealocat): un shard aleator, cu
+        probabilitatea egală cu partea lui din inel, ca datele să se
+        împartă la fel ca pe inel, nu după ce backend e mai rapid.
+        """
+        if method != "POST" or path not in ("/employee", "/employees/bulk"):
+            return None
+        return self.shard_urls[self.ring.owner(random.getrandbits(64))]
+
+    def scatters(self, method, path):
+        return (method, path) in (
+            ("GET", "/employees"),
+            ("POST", "/employees/lookup"),
+            ("PUT", "/employees/bulk"),
+            ("DELETE", "/employees/bulk"),
+        )
+
+    def handle(self, method, path, query, headers, body):
+        """
+        Întoarce (status, headers, iterabil de bytes) pentru o rută pentru
+        care scatters() e adevărat; aruncă UpstreamError.
+        """
+        self.scattered += 1
+        headers = {
+            name: value for name, value in headers.items()
+            if name.lower() not in ("content-length", "content-type")
+        }
+        params = parse_qs(query)
+        if method == "GET" and "ids" in params:
+            try:
+                ids = [int(i) for i in params["ids"][0].split(",") if i.strip()]
+            except ValueError:
+                ids = None
+            return self._lookup(ids, method, path, query, headers, body)
+        if method == "GET":
+            return self._list(params, path, query, headers)
+
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        if path == "/employees/lookup":
+            ids = payload.get("ids") if isinstance(payload, dict) else payload
+            return self._lookup(ids, method, path, query, headers, body)
+        if method == "PUT":
+            items = payload.get("employees") if isinstance(payload, dict) else payload
+            return self._bulk_update(items, path, query, headers, body)
+        ids = payload.get("ids") if isinstance(payload, dict) else payload
+        return self._bulk_delete(ids, path, query, headers, body)
+
+    # ---- cereri către shard-uri ----
+
+    def _fetch(self, shard, method, path, headers, body=None):
+        url = self.shard_urls[shard]
+        backend = self.selector.acquire_url(url)
+        started = time.monotonic()
+        ok = False
+        try:
+            if body is not None:
+                headers = dict(headers, **{"Content-Type": "application/json"})
+            status, resp_headers, data = self.pools[url].fetch(
+                method, path, headers=headers, body=body
+            )
+            ok = status < 500
+            return status, end_to_end_headers(resp_headers), data
+        finally:
+            self.selector.release(backend, time.monotonic() - started, ok)
+
+    def _scatter(self, method, path, headers, bodies):
+        """{shard: body} trimise în paralel -> {shard: (status, headers, data)}."""
+        futures = {
+            shard: self._executor.submit(self._fetch, shard, method, path, headers, body)
+            for shard, body in bodies.items()
+        }
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def _forward_one(self, method, path, query, headers, body):
+        shard = self.ring.shards[0]
+        if query:
+            path = f"{path}?{query}"
+        status, resp_headers, data = self._fetch(shard, method, path, headers, body or None)
+        return status, resp_headers, [data]
+
+    @staticmethod
+    def _first_error(results):
+        for status, resp_headers, data in results.values():
+            if status != 200:
+                return status, resp_headers, [data]
+        return None
+
+    @staticmethod
+    def _json_response(data, results):
+        info = " | ".join(
+            value for result in results.values() for name, value in result[1]
+            if name.lower() == "x-database-info"
+        )
+        headers = [("Content-Type", "application/json"), ("X-Database-Info", info)]
+        return 200, headers, [json.dumps(data).encode()]
+
+    # ---- lookup și bulk ----
+
+    def _lookup(self, ids, method, path, query, headers, body):
+        if not ids or not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return self._forward_one(method, path, query, headers, body)
+        groups = self.ring.group(ids)
+        results = self._scatter(
+            "POST",
+            "/employees/lookup",
+            headers,
+            {shard: json.dumps({"ids": shard_ids}).encode() for shard, shard_ids in groups.items()},
+        )
+        error = self._first_error(results)
+        if error:
+            return error
+        found = {}
+        for shard, (_, _, data) in results.items():
+            found.update(zip(groups[shard], json.loads(data)))
+        return self._json_response([found[employee_id] for employee_id in ids], results)
+
+    def _bulk_update(self, items, path, query, headers, body):
+        if not items or not isinstance(items, list) or not all(
+            isinstance(item, dict) and isinstance(item.get("id"), int) for item in items
+        ):
+            return self._forward_one("PUT", path, query, headers, body)
+        bodies = {}
+        for item in items:
+            bodies.setdefault(self.ring.owner(item["id"]), []).append(item)
+        results = self._scatter(
+            "PUT", path, headers,
+            {shard: json.dumps(shard_items).encode() for shard, shard_items in bodies.items()},
+        )
+        error = self._first_error(results)
+        if error:
+            return error
+        position = {}
+        for index, item in enumerate(items):
+            position.setdefault(item["id"], index)
+        updated, not_found = [], []
+        for _, _, data in results.values():
+            merged = json.loads(data)
+            updated += merged["updated"]
+            not_found += merged["not_found"]
+        updated.sort(key=lambda item: position[item["id"]])
+        not_found.sort(key=lambda employee_id: position[employee_id])
+        return self._json_response({"updated": updated, "not_found": not_found}, results)
+
+    def _bulk_delete(self, ids, path, query, headers, body):
+        if not ids or not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return self._forward_one("DELETE", path, query, headers, body)
+        results = self._scatter(
+            "DELETE", path, headers,
+            {shard: json.dumps(shard_ids).encode() for shard, shard_ids in self.ring.group(ids).items()},
+        )
+        error = self._first_error(results)
+        if error:
+            return error
+        deleted, not_found = [], []
+        for _, _, data in results.values():
+            merged = json.loads(data)
+            deleted += merged["deleted_ids"]
+            not_found += merged["not_found"]
+        return self._json_response(
+            {"success": True, "deleted_ids": sorted(deleted), "not_found": sorted(not_found)},
+            results,
+        )
+
+    # ---- GET /employees: scatter-gather în streaming ----
+
+    def _open_stream(self, shard, path, headers):
+        url = self.shard_urls[shard]
+        backend = self.selector.acquire_url(url)
+        started = time.monotonic()
+        try:
+            status, resp_headers, body = self.pools[url].stream(
+                "GET", path, headers=dict(headers, Accept="application/x-ndjson")
+            )
+        except UpstreamError:
+            self.selector.release(backend, time.monotonic() - started, False)
+            raise
+        latency = time.monotonic() - started
+        body.on_close = lambda complete: self.selector.release(
+            backend, latency, complete and status < 500
+        )
+        return status, end_to_end_headers(resp_headers), body
+
+    def _list(self, params, path, query, headers):
+        try:
+            int(params.get("after_id", ["0"])[0])
+            limit = int(params["limit"][0]) if params.get("limit", [""])[0] else None
+        except ValueError:
+            return self._forward_one("GET", path, query, headers, None)
+        if "after_id" in params or limit is not None:
+            # Aceeași limită efectivă ca pe servere
+            limit = max(1, min(limit or self.page_size, self.max_page_size))
+
+        streams = {}
+        try:
+            for shard in self.ring.shards:
+                streams[shard] = self._open_stream(
+                    shard, f"{path}?{query}" if query else path, headers
+                )
+        except UpstreamError:
+            # Eșecul e al shard-ului care nu a răspuns, nu al celorlalte
+            for _, _, body in streams.values():
+                body.abandon()
+            raise
+        for status, resp_headers, body in streams.values():
+            if status != 200:
+                data = body.read()
+                for _, _, other in streams.values():
+                    other.abandon()
+                return status, resp_headers, [data]
+
+        wants_ndjson = "application/x-ndjson" in headers.get("Accept", "")
+        state = {"more": False, "last_id": None}
+
+        def rows(body):
+            pending = b""
+            for chunk in body:
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    if "next_cursor" in row:
+                        state["more"] = True
+                        continue
+                    yield row["id"], line
+
+        def generate():
+            merged = heapq.merge(*(rows(body) for _, _, body in streams.values()), key=lambda r: r[0])
+            sent = 0
+            try:
+                if not wants_ndjson:
+                    yield b"["
+                for employee_id, line in merged:
+                    if limit is not None and sent == limit:
+                        state["more"] = True
+                        # Din fiecare shard a rămas cel mult o pagină: o
+                        # citim până la capăt, ca închiderea să nu fie
+                        # luată drept eșec și conexiunea să fie refolosită.
+                        for _, _, body in streams.values():
+                            body.read()
+                        break
+                    if wants_ndjson:
+                        yield line + b"\n"
+                    else:
+                        yield line if sent == 0 else b"," + line
+                    sent += 1
+                    state["last_id"] = employee_id
+                if wants_ndjson and limit is not None and state["more"]:
+                    yield json.dumps({"next_cursor": str(state["last_id"])}).encode() + b"\n"
+                if not wants_ndjson:
+                    yield b"]"
+            finally:
+                # Body-urile citite complet sunt deja eliberate; restul (eroare
+                # pe un shard, client deconectat) nu sunt vina shard-ului lor
+                for _, _, body in streams.values():
+                    body.abandon()
+
+        info = " | ".join(
+            value for _, resp_headers, _ in streams.values() for name, value in resp_headers
+            if name.lower() == "x-database-info"
+        )
+        content_type = "application/x-ndjson" if wants_ndjson else "application/json"
+        headers = [("Content-Type", content_type), ("X-Database-Info", info)]
+        if wants_ndjson or limit is None:
+            return 200, headers, generate()
+
+        # JSON paginat: X-Next-Cursor trebuie trimis înaintea body-ului, deci
+        # pagina (cel mult max_page_size rânduri) e bufferizată.
+        data = b"".join(generate())
+        if state["more"]:
+            headers.append(("X-Next-Cursor", str(state["last_id"])))
+        return 200, headers, [data]
+
+    def stats(self):
+        return {
+            "shards": self.shard_urls,
+            "routed": self.routed,
+            "scattered": self.scattered,
+        }
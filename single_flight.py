@@ -0,0 +1,73 @@
+# single_flight.py
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Comasează apelurile identice aflate în zbor: pentru o cheie rulează un
+    singur apel (leader-ul), iar celelalte thread-uri cu aceeași cheie îl
+    așteaptă și primesc exact același rezultat (sau aceeași excepție).
+
+    Dacă leader-ul nu termină în `wait_timeout` secunde, cel care așteaptă
+    renunță și face propriul apel, ca o cerere lentă să nu le țină pe toate.
+    """
+
+    def __init__(self, wait_timeout=5.0):
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn):
+        """Întoarce (rezultat, împărțit_cu_alt_apel?)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                leader = False
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result, False
+
+        if not call.done.wait(self.wait_timeout):
+            with self._lock:
+                self.timeouts += 1
+            return fn(), False
+
+        with self._lock:
+            self.coalesced += 1
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "wait_timeout": self.wait_timeout,
+            }
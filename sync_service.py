@@ -1,8 +1,15 @@
 # sync_service.py
 import os
 import json
+import queue
+import socket
+import threading
+import time
 import redis
 import psycopg2
+from psycopg2.extras import execute_values
+
+from replication_metrics import ReplicationMetrics, start_metrics_server
 
 # Config pentru cele două baze de date
 DB_CONFIGS = {
@@ -34,72 +41,874 @@ redis_client = redis.Redis(
     db=0,
 )
 
+# Loturi: câte notificări aplicăm într-o tranzacție și cât așteptăm după
+# prima notificare ca să se strângă lotul
+SYNC_BATCH_SIZE = int(os.environ.get("SYNC_BATCH_SIZE", 500))
+SYNC_BATCH_WINDOW = float(os.environ.get("SYNC_BATCH_WINDOW", 0.05))
+SYNC_STATS_INTERVAL = float(os.environ.get("SYNC_STATS_INTERVAL", 10))
+
+# Aplicarea e împărțită pe SYNC_WORKERS thread-uri după hash(id); fiecare are
+# o coadă de cel mult SYNC_WORKER_QUEUE loturi (backpressure)
+SYNC_WORKERS = int(os.environ.get("SYNC_WORKERS", 4))
+SYNC_WORKER_QUEUE = int(os.environ.get("SYNC_WORKER_QUEUE", 8))
+
+# Endpoint HTTP cu lag-ul replicării (/metrics, /metrics.json); 0 = dezactivat
+SYNC_METRICS_PORT = int(os.environ.get("SYNC_METRICS_PORT", 9100))
+
+# Transport: "pubsub" (implicit, fire-and-forget) sau "stream" (Redis Stream
+# durabil, citit printr-un consumer group cu XACK explicit)
+SYNC_TRANSPORT = os.environ.get("SYNC_TRANSPORT", "pubsub")
+SYNC_CHANNEL = os.environ.get("SYNC_CHANNEL", "db_sync_channel")
+# Confirmările de aplicare, ascultate de load balancer (read-your-writes)
+SYNC_APPLIED_CHANNEL = os.environ.get("SYNC_APPLIED_CHANNEL", "db_sync_applied")
+SYNC_STREAM = os.environ.get("SYNC_STREAM", "db_sync_stream")
+SYNC_GROUP = os.environ.get("SYNC_GROUP", "sync_service")
+# Numele trebuie să rămână același între restarturi, ca să-și regăsească
+# intrările neconfirmate
+SYNC_CONSUMER = os.environ.get("SYNC_CONSUMER", socket.gethostname())
+SYNC_CLAIM_IDLE = float(os.environ.get("SYNC_CLAIM_IDLE", 30))
+SYNC_MAX_DELIVERIES = int(os.environ.get("SYNC_MAX_DELIVERIES", 10))
+SYNC_TRIM_INTERVAL = float(os.environ.get("SYNC_TRIM_INTERVAL", 60))
+# Notificările malformate (care n-au cum să reușească la o reluare) ajung
+# aici, în ambele transporturi; implicit același stream ca intrările otrăvite
+SYNC_DEAD_LETTER = os.environ.get("SYNC_DEAD_LETTER", f"{SYNC_STREAM}:dead")
+
+# Cu SHARDING=1 tabela employees e împărțită între db1 și db2 (fiecare rând
+# există doar pe shard-ul lui), deci nu mai e nimic de replicat
+SHARDING_ENABLED = os.environ.get("SHARDING", "0") == "1"
+
+
+# Momentul scrierii pe baza sursă; fără origin_ts (mesaj vechi), momentul aplicării
+ORIGIN_TS = "COALESCE(to_timestamp(%s::double precision), now())"
+
+
+def apply_batch(cursor, operation, rows):
+    """
+    Aplică un lot venit de la /employees/bulk printr-o singură instrucțiune
+    set-based, în loc de câte un INSERT/UPDATE/DELETE pe rând.
+
+    `updated_at` primește momentul commit-ului de pe baza sursă (`origin_ts`),
+    deci aceeași scriere are același updated_at pe ambele baze. Aplicarea e
+    last-writer-wins: o notificare reluată (retry, reclaim) nu suprascrie un
+    rând mai nou, iar un insert mai vechi decât ștergerea rândului (tombstone
+    în employees_deleted) nu îl mai readuce.
+    """
+    if operation == "delete":
+        values = [(row["id"], row.get("origin_ts")) for row in rows]
+        execute_values(
+            cursor,
+            """
+            DELETE FROM employees AS e
+            USING (VALUES %s) AS v(id, deleted_at)
+            WHERE e.id = v.id AND e.updated_at <= v.deleted_at
+            """,
+            values,
+            template=f"(%s::integer, {ORIGIN_TS})",
+            page_size=len(rows),
+        )
+        # Trigger-ul a notat ștergerea cu ora replicii; o vrem pe cea a
+        # sursei, și pentru rândurile care încă nu ajunseseră aici
+        execute_values(
+            cursor,
+            """
+            INSERT INTO employees_deleted (id, deleted_at) VALUES %s
+            ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+            """,
+            values,
+            template=f"(%s, {ORIGIN_TS})",
+            page_size=len(rows),
+        )
+    elif operation in ("insert", "upsert"):
+        # upsert = insert comasat cu un update ulterior: dacă rândul există
+        # deja (o livrare repetată), update-ul nu trebuie pierdut
+        on_conflict = "DO NOTHING" if operation == "insert" else """DO UPDATE
+            SET name = EXCLUDED.name, position = EXCLUDED.position, updated_at = EXCLUDED.updated_at
+            WHERE employees.updated_at <= EXCLUDED.updated_at"""
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO employees (id, name, position, updated_at)
+            SELECT v.id, v.name, v.position, v.updated_at
+            FROM (VALUES %s) AS v(id, name, position, updated_at)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM employees_deleted AS d
+                WHERE d.id = v.id AND d.deleted_at >= v.updated_at
+            )
+            ON CONFLICT (id) {on_conflict}
+            """,
+            [(row["id"], row["name"], row["position"], row.get("origin_ts")) for row in rows],
+            template=f"(%s::integer, %s, %s, {ORIGIN_TS})",
+            page_size=len(rows),
+        )
+    elif operation == "update":
+        execute_values(
+            cursor,
+            """
+            UPDATE employees AS e
+            SET name = v.name, position = v.position, updated_at = v.updated_at
+            FROM (VALUES %s) AS v(id, name, position, updated_at)
+            WHERE e.id = v.id AND e.updated_at <= v.updated_at
+            """,
+            [(row["id"], row["name"], row["position"], row.get("origin_ts")) for row in rows],
+            template=f"(%s::integer, %s, %s, {ORIGIN_TS})",
+            page_size=len(rows),
+        )
+    else:
+        print(f"[Sync Service] Operație necunoscută: {operation}")
+        return
+    print(f"  -> Succes {operation.upper()} în lot: {len(rows)} rânduri replicate.")
 
-def synchronize_data(message):
+
+def parse_notification(message):
+    """Notificarea dintr-un mesaj pub/sub, sau None dacă nu e de replicat."""
+    # Redis pubsub mai trimite și type='subscribe' etc, le ignorăm
+    if message is None or message.get("type") != "message":
+        return None
+    notification = decode_notification(message["data"])
+    if notification is None:
+        dead_letter({"payload": message["data"]}, "invalid notification")
+    return notification
+
+
+def decode_notification(data):
+    """Notificarea JSON (din pub/sub sau din stream), validată."""
+    try:
+        notification = json.loads(data)
+    except (TypeError, ValueError):
+        print("[Sync Service] Mesaj invalid, ignor...")
+        return None
+    if not isinstance(notification, dict):
+        print("[Sync Service] Mesajul nu e un obiect JSON, ignor...")
+        return None
+
+    operation = notification.get("operation")
+    payload = notification.get("data")
+    source_db = notification.get("source_db")
+    if not operation or not payload or not source_db:
+        print("[Sync Service] Mesaj incomplet, ignor...")
+        return None
+    if operation not in ("insert", "update", "delete"):
+        print(f"[Sync Service] Operație necunoscută: {operation}")
+        return None
+    required = ("id",) if operation == "delete" else ("id", "name", "position")
+    for row in payload if isinstance(payload, list) else [payload]:
+        if not isinstance(row, dict) or any(field not in row for field in required) or not isinstance(row["id"], int):
+            print("[Sync Service] Rând invalid în notificare, ignor...")
+            return None
+    return notification
+
+
+def dead_letter(fields, error):
+    """Păstrează o notificare care nu poate fi aplicată, în loc s-o pierdem."""
     try:
-        # Redis pubsub mai trimite și type='subscribe' etc, le ignorăm
-        if message.get("type") != "message":
+        redis_client.xadd(SYNC_DEAD_LETTER, {**fields, "error": error})
+        print(f"[Sync Service] Notificare mutată în {SYNC_DEAD_LETTER}: {error}")
+    except redis.RedisError as e:
+        print(f"[Sync Service] Nu pot scrie în {SYNC_DEAD_LETTER}: {e}")
+
+
+def coalesce(notifications):
+    """
+    Comprimă notificările unui lot (în ordinea sosirii) la starea finală per
+    ID și întoarce (deletes, inserts, upserts, updates), de aplicat în
+    ordinea asta. Fiecare rând poartă `origin_ts` al notificării lui.
+
+    - insert urmat de update -> un singur upsert cu valorile noi (livrarea
+      e at-least-once, deci rândul poate exista deja în replică);
+    - delete urmat de insert -> delete, apoi insert;
+    - altfel ultima operație pe un ID câștigă.
+    """
+    final = {}
+    deleted_before_insert = {}
+    for notification in notifications:
+        operation = notification["operation"]
+        payload = notification["data"]
+        for row in payload if isinstance(payload, list) else [payload]:
+            if not isinstance(row, dict) or "id" not in row:
+                continue
+            employee_id = row["id"]
+            row = {**row, "origin_ts": notification.get("origin_ts")}
+            previous = final.get(employee_id)
+            if operation == "update" and previous and previous[0] in ("insert", "upsert"):
+                operation_for_id = "upsert"
+            else:
+                operation_for_id = operation
+            if operation == "insert" and previous and previous[0] == "delete":
+                deleted_before_insert[employee_id] = previous[1]
+            final[employee_id] = (operation_for_id, row)
+
+    deletes = dict(deleted_before_insert)
+    deletes.update(
+        (employee_id, row) for employee_id, (operation, row) in final.items() if operation == "delete"
+    )
+    deletes = [deletes[employee_id] for employee_id in sorted(deletes)]
+    inserts = [row for operation, row in final.values() if operation == "insert"]
+    upserts = [row for operation, row in final.values() if operation == "upsert"]
+    updates = [row for operation, row in final.values() if operation == "update"]
+    return deletes, inserts, upserts, updates
+
+
+class SyncApplier:
+    """
+    Aplică loturi de notificări pe baza țintă, pe o conexiune persistentă per
+    bază, într-o singură tranzacție per lot și cu câte o instrucțiune
+    set-based per tip de operație.
+    """
+
+    def __init__(self, db_configs):
+        self.db_configs = db_configs
+        self._connections = {}
+        self.counters = {
+            "messages": 0,
+            "rows": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "fallbacks": 0,
+            "errors": 0,
+            "rejected": 0,
+            "reconnects": 0,
+        }
+        self.started_at = time.monotonic()
+
+    def _connection(self, target_db_name):
+        conn = self._connections.get(target_db_name)
+        if conn is None or conn.closed:
+            conn = psycopg2.connect(**self.db_configs[target_db_name])
+            self._connections[target_db_name] = conn
+        return conn
+
+    def _drop_connection(self, target_db_name):
+        conn = self._connections.pop(target_db_name, None)
+        if conn is not None:
+            self.counters["reconnects"] += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _apply(self, target_db_name, notifications):
+        deletes, inserts, upserts, updates = coalesce(notifications)
+        conn = self._connection(target_db_name)
+        with conn:
+            with conn.cursor() as cursor:
+                if deletes:
+                    apply_batch(cursor, "delete", deletes)
+                if inserts:
+                    apply_batch(cursor, "insert", inserts)
+                if upserts:
+                    apply_batch(cursor, "upsert", upserts)
+                if updates:
+                    apply_batch(cursor, "update", updates)
+        return {row["id"] for row in deletes + inserts + upserts + updates}
+
+    def apply(self, notifications):
+        """
+        Aplică un lot, grupat pe baza țintă. Întoarce (ID-urile atinse,
+        pozițiile din lot ale notificărilor care n-au putut fi aplicate).
+        O notificare malformată nu e reîncercată: ajunge în dead-letter și
+        nu apare printre cele eșuate.
+        """
+        by_target = {}
+        for index, notification in enumerate(notifications):
+            # db1 -> replicăm în db2; db2 -> replicăm în db1
+            target_db_name = "db2" if notification["source_db"] == "db1" else "db1"
+            if target_db_name not in self.db_configs:
+                print(f"[Sync Service] Config lipsă pentru {target_db_name}, ignor...")
+                continue
+            by_target.setdefault(target_db_name, []).append((index, notification))
+
+        touched = set()
+        failed = set()
+        for target_db_name, entries in by_target.items():
+            batch = [notification for _, notification in entries]
+            print(
+                f"[Sync Service] Lot de {len(batch)} notificări. "
+                f"Replicare în '{target_db_name}'..."
+            )
+            try:
+                touched |= self._apply(target_db_name, batch)
+            except (psycopg2.Error, KeyError, TypeError, ValueError, AttributeError) as e:
+                # Lotul s-a anulat în întregime: reluăm mesajele unul câte
+                # unul, ca un singur mesaj stricat să nu le piardă pe toate.
+                print(f"[Sync Service] Lotul a eșuat ({e}), aplic mesajele individual...")
+                self.counters["fallbacks"] += 1
+                self._drop_connection(target_db_name)
+                for index, notification in entries:
+                    try:
+                        touched |= self._apply(target_db_name, [notification])
+                    except psycopg2.Error as single_error:
+                        print(f"EROARE în timpul sincronizării: {single_error}")
+                        self.counters["errors"] += 1
+                        failed.add(index)
+                        self._drop_connection(target_db_name)
+                    except (KeyError, TypeError, ValueError, AttributeError) as malformed:
+                        self.counters["rejected"] += 1
+                        dead_letter({"payload": json.dumps(notification, default=str)}, repr(malformed))
+
+        rows = sum(
+            len(n["data"]) if isinstance(n["data"], list) else 1 for n in notifications
+        )
+        self.counters["messages"] += len(notifications)
+        self.counters["rows"] += rows
+        self.counters["batches"] += 1
+        self.counters["max_batch"] = max(self.counters["max_batch"], len(notifications))
+        return touched, failed
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        stats = dict(self.counters)
+        batches = stats["batches"]
+        stats["avg_batch"] = round(stats["messages"] / batches, 2) if batches else 0.0
+        stats["messages_per_sec"] = round(stats["messages"] / elapsed, 2)
+        stats["rows_per_sec"] = round(stats["rows"] / elapsed, 2)
+        return stats
+
+
+class _PendingBatch:
+    """Lotul original, împărțit pe workeri; `on_done` rulează după ultima parte."""
+
+    def __init__(self, parts, on_done):
+        self.remaining = parts
+        self.on_done = on_done
+        self.touched = set()
+        self.failed = set()
+        self._lock = threading.Lock()
+
+    def part_done(self, touched, failed):
+        with self._lock:
+            self.touched |= touched
+            self.failed |= failed
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done and self.on_done is not None:
+            self.on_done(self.touched, self.failed)
+
+
+class _Worker:
+    """Un thread cu coada lui mărginită și propriul SyncApplier (conexiuni proprii)."""
+
+    def __init__(self, index, db_configs, max_pending):
+        self.index = index
+        self.applier = SyncApplier(db_configs)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.max_depth = 0
+        self.blocked = 0
+        self.blocked_time = 0.0
+        self._thread = threading.Thread(target=self._loop, name=f"sync-worker-{index}", daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Backpressure: workerul nu ține pasul, dispecerul așteaptă după el
+            started = time.monotonic()
+            self.queue.put(item)
+            self.blocked += 1
+            self.blocked_time += time.monotonic() - started
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _loop(self):
+        while True:
+            notifications, indexes, pending = self.queue.get()
+            try:
+                touched, failed = self.applier.apply(notifications)
+            except Exception as e:
+                print(f"EROARE în timpul sincronizării (worker {self.index}): {e}")
+                touched, failed = set(), set(range(len(notifications)))
+            try:
+                pending.part_done(touched, {indexes[i] for i in failed})
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "blocked": self.blocked,
+            "blocked_time_ms": round(self.blocked_time * 1000, 2),
+            "batches": self.applier.counters["batches"],
+            "rows": self.applier.counters["rows"],
+        }
+
+
+def partition_notification(notification, workers):
+    """
+    Împarte o notificare pe workeri după hash(id); o notificare bulk (listă)
+    devine câte o sub-notificare per worker, cu rândurile lui, în aceeași ordine.
+    """
+    payload = notification["data"]
+    if not isinstance(payload, list):
+        return {hash(payload.get("id")) % workers: notification}
+    rows_by_worker = {}
+    for row in payload:
+        worker = hash(row.get("id")) % workers if isinstance(row, dict) else 0
+        rows_by_worker.setdefault(worker, []).append(row)
+    return {
+        worker: {**notification, "data": rows}
+        for worker, rows in rows_by_worker.items()
+    }
+
+
+class PartitionedApplier:
+    """
+    Distribuie aplicarea pe `workers` thread-uri, partiționat după
+    hash(id-ul angajatului): toate operațiile pentru același angajat ajung
+    la același worker și se aplică în ordinea sosirii, iar angajații diferiți
+    se aplică în paralel. Fiecare worker are o coadă de cel mult
+    `max_pending` loturi; când e plină, dispecerul (și deci citirea din
+    Redis) așteaptă.
+    """
+
+    def __init__(self, db_configs, workers=4, max_pending=8):
+        self.workers = [_Worker(index, db_configs, max_pending) for index in range(workers)]
+        self.messages = 0
+        self.batches = 0
+        self.started_at = time.monotonic()
+
+    def submit(self, notifications, on_done=None):
+        """
+        Trimite lotul la workeri fără să aștepte aplicarea. `on_done(ids,
+        failed)` primește ID-urile atinse și pozițiile notificărilor eșuate.
+        """
+        parts = {}
+        for index, notification in enumerate(notifications):
+            for worker, part in partition_notification(notification, len(self.workers)).items():
+                sub_notifications, indexes = parts.setdefault(worker, ([], []))
+                sub_notifications.append(part)
+                indexes.append(index)
+
+        self.messages += len(notifications)
+        self.batches += 1
+        if not parts:
+            if on_done is not None:
+                on_done(set(), set())
             return
+        pending = _PendingBatch(len(parts), on_done)
+        for worker, (sub_notifications, indexes) in parts.items():
+            self.workers[worker].put((sub_notifications, indexes, pending))
 
-        notification = json.loads(message["data"])
+    def drain(self):
+        """Așteaptă până când workerii au aplicat (și confirmat) tot ce au primit."""
+        for worker in self.workers:
+            worker.queue.join()
 
-        operation = notification.get("operation")
-        payload = notification.get("data")
-        source_db = notification.get("source_db")
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        totals = {"rows": 0, "fallbacks": 0, "errors": 0, "rejected": 0, "reconnects": 0}
+        max_batch = 0
+        for worker in self.workers:
+            for name in totals:
+                totals[name] += worker.applier.counters[name]
+            max_batch = max(max_batch, worker.applier.counters["max_batch"])
+        stats = {
+            "messages": self.messages,
+            "batches": self.batches,
+            "avg_batch": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "max_batch": max_batch,
+            "messages_per_sec": round(self.messages / elapsed, 2),
+            "rows_per_sec": round(totals["rows"] / elapsed, 2),
+            "workers": len(self.workers),
+            **totals,
+        }
+        for worker in self.workers:
+            for name, value in worker.stats().items():
+                stats[f"worker{worker.index}_{name}"] = value
+        return stats
 
-        if not operation or not payload or not source_db:
-            print("[Sync Service] Mesaj incomplet, ignor...")
+
+def next_batch(pubsub, batch_size, batch_window, idle_timeout=1.0):
+    """
+    Așteaptă primul mesaj, apoi adună tot ce mai sosește, până la
+    `batch_size` notificări sau `batch_window` secunde.
+    """
+    batch = []
+    deadline = None
+    while len(batch) < batch_size:
+        if deadline is None:
+            timeout = idle_timeout
+        else:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+        notification = parse_notification(pubsub.get_message(timeout=timeout))
+        if notification is not None:
+            batch.append(notification)
+            if deadline is None:
+                deadline = time.monotonic() + batch_window
+        elif deadline is None:
+            return batch  # nimic în idle_timeout, lăsăm apelantul să ruleze din nou
+    return batch
+
+
+def invalidate_cache(ids):
+    # Replica tocmai s-a schimbat: o intrare din cache citită din ea
+    # înainte de replicare (inclusiv un 404 ținut ca "null") e acum veche.
+    if not ids:
+        return
+    try:
+        redis_client.delete(*(f"employee:{employee_id}" for employee_id in ids))
+    except redis.RedisError as e:
+        print(f"[Sync Service] Nu pot invalida cache-ul: {e}")
+
+
+def confirm_applied(notifications, failed=()):
+    """
+    Anunță pe SYNC_APPLIED_CHANNEL ce notificări (baza sursă + outbox_id) au
+    ajuns în replică; load balancer-ul eliberează atunci read-your-writes.
+    Mesajul poartă și ID-urile angajaților (`ids`): cache-urile din memorie
+    (edge cache, near cache) le invalidează din nou, fiindcă o citire din
+    replică înainte de aplicare le-ar fi putut pune la loc valoarea veche.
+    """
+    applied = {}
+    for index, notification in enumerate(notifications):
+        if index in failed:
+            continue
+        entry = applied.setdefault(notification["source_db"], {"outbox_ids": [], "ids": set()})
+        if notification.get("outbox_id") is not None:
+            entry["outbox_ids"].append(notification["outbox_id"])
+        payload = notification["data"]
+        entry["ids"].update(row["id"] for row in (payload if isinstance(payload, list) else [payload]))
+    if not applied:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for source_db, entry in applied.items():
+            pipe.publish(
+                SYNC_APPLIED_CHANNEL,
+                json.dumps(
+                    {"source_db": source_db, "outbox_ids": entry["outbox_ids"], "ids": sorted(entry["ids"])}
+                ),
+            )
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"[Sync Service] Nu pot confirma aplicarea: {e}")
+
+
+def report_stats(applier):
+    stats = applier.stats()
+    redis_client.hset("sync_service:stats", mapping=stats)
+    print(f"[Sync Service] Statistici: {stats}")
+
+
+def run_pubsub(applier, metrics):
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe(SYNC_CHANNEL)
+    print(f"[Sync Service] Ascult pe canalul '{SYNC_CHANNEL}' (pub/sub)")
+    last_report = time.monotonic()
+
+    while True:
+        batch = next_batch(pubsub, SYNC_BATCH_SIZE, SYNC_BATCH_WINDOW)
+        if batch:
+            metrics.observe_received(batch)
+
+            def done(ids, failed, batch=batch):
+                metrics.observe_applied(batch, failed)
+                invalidate_cache(ids)
+                confirm_applied(batch, failed)
+
+            applier.submit(batch, on_done=done)
+
+        if time.monotonic() - last_report >= SYNC_STATS_INTERVAL:
+            report_stats(applier)
+            last_report = time.monotonic()
+
+
+def stream_id(entry_id):
+    """ID-ul unei intrări de stream ca tuplu comparabil (ms, secvență)."""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class StreamConsumer:
+    """
+    Citește jurnalul de replicare din Redis Stream printr-un consumer group.
+
+    - intrările se confirmă (XACK) abia după commit-ul în baza țintă, deci
+      la restart consumatorul își reia întâi propriile intrări neconfirmate
+      și apoi continuă de unde a rămas grupul;
+    - intrările care stau neconfirmate mai mult de `claim_idle` secunde (ale
+      unui consumator mort sau eșuate) sunt revendicate cu XCLAIM; după
+      `max_deliveries` livrări sunt mutate în `<stream>:dead` și confirmate;
+    - stream-ul e tăiat periodic (XTRIM MINID) până la cea mai veche intrare
+      încă necesară vreunui grup.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        applier,
+        stream,
+        group,
+        consumer,
+        batch_size=500,
+        block=1.0,
+        claim_idle=30.0,
+        max_deliveries=10,
+        retry_delay=2.0,
+        metrics=None,
+    ):
+        self.redis = redis_client
+        self.applier = applier
+        self.metrics = metrics or ReplicationMetrics()
+        self.stream = stream
+        self.dead_stream = f"{stream}:dead"
+        self.group = group
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block = block
+        self.claim_idle = claim_idle
+        self.max_deliveries = max_deliveries
+        self.retry_delay = retry_delay
+
+        self._stalled = threading.Event()
+        self._lock = threading.Lock()
+        self.acked = 0
+        self.reclaimed = 0
+        self.dead_lettered = 0
+        self.trimmed = 0
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            print(f"[Sync Service] Grup '{self.group}' creat pe '{self.stream}'")
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read(self, start):
+        """
+        `start` = ">" pentru intrări noi, altfel un ID: intrările proprii
+        neconfirmate de după el.
+        """
+        response = self.redis.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: start},
+            count=self.batch_size,
+            block=int(self.block * 1000) if start == ">" else None,
+        )
+        return response[0][1] if response else []
+
+    def process(self, entries):
+        """
+        Trimite intrările la aplicat; cele aplicate se confirmă (din threadul
+        workerului) după commit, cele eșuate rămân neconfirmate pentru reclaim.
+        """
+        entry_ids = []
+        notifications = []
+        invalid = []
+        for entry_id, fields in entries:
+            notification = decode_notification(fields.get(b"payload"))
+            if notification is None:
+                invalid.append((entry_id, fields))
+            else:
+                entry_ids.append(entry_id)
+                notifications.append(notification)
+
+        if invalid:
+            # Nu pot reuși la nicio reluare: direct în dead-letter
+            for entry_id, fields in invalid:
+                self.redis.xadd(self.dead_stream, {**fields, b"source_id": entry_id, b"error": b"invalid notification"})
+            self.dead_lettered += len(invalid)
+            self.ack([entry_id for entry_id, _ in invalid])
+        if not notifications:
+            return
+
+        self.metrics.observe_received(notifications)
+
+        def done(ids, failed):
+            self.metrics.observe_applied(notifications, failed)
+            invalidate_cache(ids)
+            confirm_applied(notifications, failed)
+            if failed and len(failed) == len(entry_ids):
+                # Nimic nu s-a putut aplica (probabil baza țintă e căzută)
+                self._stalled.set()
+            self.ack([entry_id for index, entry_id in enumerate(entry_ids) if index not in failed])
+
+        self.applier.submit(notifications, on_done=done)
+
+    def ack(self, entry_ids):
+        if not entry_ids:
+            return
+        try:
+            self.redis.xack(self.stream, self.group, *entry_ids)
+        except redis.RedisError as e:
+            # Rămân neconfirmate: vor fi reluate (at-least-once)
+            print(f"[Sync Service] Nu pot confirma {len(entry_ids)} intrări: {e}")
             return
+        with self._lock:
+            self.acked += len(entry_ids)
+
+    def reclaim(self):
+        """Revendică intrările uitate neconfirmate; le trimite pe cele otrăvite în dead-letter."""
+        pending = self.redis.xpending_range(
+            self.stream,
+            self.group,
+            min="-",
+            max="+",
+            count=self.batch_size,
+            idle=int(self.claim_idle * 1000),
+        )
+        if not pending:
+            return []
+
+        dead = [p["message_id"] for p in pending if self.exhausted(p)]
+        for entry_id in dead:
+            self._move_to_dead(entry_id)
+
+        retry = [p["message_id"] for p in pending if p["message_id"] not in dead]
+        if not retry:
+            return []
+        claimed = self.redis.xclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=int(self.claim_idle * 1000),
+            message_ids=retry,
+        )
+        # Intrările deja tăiate din stream vin fără câmpuri: nu mai au ce aplica
+        gone = [entry_id for entry_id, fields in claimed if not fields]
+        if gone:
+            self.redis.xack(self.stream, self.group, *gone)
+        self.reclaimed += len(claimed) - len(gone)
+        return [(entry_id, fields) for entry_id, fields in claimed if fields]
+
+    def _move_to_dead(self, entry_id):
+        for _, fields in self.redis.xrange(self.stream, min=entry_id, max=entry_id):
+            self.redis.xadd(self.dead_stream, {**fields, b"source_id": entry_id})
+        self.redis.xack(self.stream, self.group, entry_id)
+        self.dead_lettered += 1
+        print(f"[Sync Service] Intrarea {entry_id} mutată în {self.dead_stream}")
 
-        # db1 -> replicăm în db2; db2 -> replicăm în db1
-        target_db_name = "db2" if source_db == "db1" else "db1"
+    def exhausted(self, pending_entry):
+        """Intrarea a fost livrată deja de `max_deliveries` ori (reclaim și backlog)."""
+        return pending_entry["times_delivered"] >= self.max_deliveries
 
+    def without_exhausted(self, entries):
+        """
+        Intrările din backlog, fără cele livrate deja de `max_deliveries`
+        ori (mutate în dead-letter): reluate mereu în ordine, una otrăvită
+        ar bloca altfel consumatorul la nesfârșit.
+        """
+        pending = self.redis.xpending_range(
+            self.stream,
+            self.group,
+            min=entries[0][0],
+            max=entries[-1][0],
+            count=len(entries),
+            consumername=self.consumer,
+        )
+        exhausted = {p["message_id"] for p in pending if self.exhausted(p)}
+        for entry_id in exhausted:
+            self._move_to_dead(entry_id)
+        return [(entry_id, fields) for entry_id, fields in entries if entry_id not in exhausted]
+
+    def trim(self):
+        """Taie tot ce au confirmat toate grupurile stream-ului."""
+        safe = None
+        for group in self.redis.xinfo_groups(self.stream):
+            oldest = group["last-delivered-id"]
+            if group["pending"]:
+                oldest = self.redis.xpending(self.stream, group["name"])["min"]
+            if safe is None or stream_id(oldest) < stream_id(safe):
+                safe = oldest
+        if safe is not None and stream_id(safe) > (0, 0):
+            self.trimmed += self.redis.xtrim(self.stream, minid=safe)
+
+    def stats(self):
+        with self._lock:
+            acked = self.acked
+        return {
+            "acked": acked,
+            "reclaimed": self.reclaimed,
+            "dead_lettered": self.dead_lettered,
+            "trimmed": self.trimmed,
+        }
+
+    def run(self, stats_interval=10.0, claim_interval=10.0, trim_interval=60.0):
+        self.ensure_group()
         print(
-            f"[Sync Service] Notificare '{operation}' de la '{source_db}'. "
-            f"Replicare în '{target_db_name}'..."
+            f"[Sync Service] Citesc '{self.stream}' ca '{self.consumer}' "
+            f"în grupul '{self.group}'"
         )
+        # Întâi intrările proprii rămase neconfirmate la oprire, de la cea mai
+        # veche; cele care eșuează din nou rămân pentru reclaim.
+        backlog_from = "0"
+        last_report = last_claim = last_trim = time.monotonic()
 
-        db_config = DB_CONFIGS.get(target_db_name)
-        if not db_config:
-            print(f"[Sync Service] Config lipsă pentru {target_db_name}, ignor...")
-            return
+        while True:
+            try:
+                entries = self.read(backlog_from or ">")
+                if backlog_from:
+                    if not entries:
+                        backlog_from = None
+                        print("[Sync Service] Intrările neconfirmate au fost reluate, continui cu cele noi")
+                        continue
+                    backlog_from = entries[-1][0]
+                    entries = self.without_exhausted(entries)
 
-        with psycopg2.connect(**db_config) as conn:
-            conn.autocommit = True
-            with conn.cursor() as cursor:
-                if operation == "insert":
-                    sql = """
-                        INSERT INTO employees (id, name, position)
-                        VALUES (%(id)s, %(name)s, %(position)s)
-                        ON CONFLICT (id) DO NOTHING
-                    """
-                    cursor.execute(sql, payload)
-                    print(f"  -> Succes INSERT: ID {payload.get('id')} replicat.")
-
-                elif operation == "update":
-                    sql = """
-                        UPDATE employees
-                        SET name = %(name)s, position = %(position)s
-                        WHERE id = %(id)s
-                    """
-                    cursor.execute(sql, payload)
-                    print(f"  -> Succes UPDATE: ID {payload.get('id')} replicat.")
-
-                elif operation == "delete":
-                    sql = "DELETE FROM employees WHERE id = %(id)s"
-                    cursor.execute(sql, payload)
-                    print(f"  -> Succes DELETE: ID {payload.get('id')} replicat.")
-
-                else:
-                    print(f"[Sync Service] Operație necunoscută: {operation}")
-
-    except Exception as e:
-        print(f"EROARE în timpul sincronizării: {e}")
+                if entries:
+                    self.process(entries)
+                if self._stalled.is_set():
+                    # Intrările eșuate rămân neconfirmate. Le reluăm după o
+                    # pauză, în ordine, din backlog și înaintea celor noi:
+                    # altfel intrări mai noi pentru aceleași ID-uri s-ar aplica
+                    # înaintea lor, iar reclaim-ul le-ar suprascrie apoi.
+                    # Întâi golim workerii, ca backlog-ul să nu conțină
+                    # intrări încă în lucru.
+                    self.applier.drain()
+                    self._stalled.clear()
+                    time.sleep(self.retry_delay)
+                    backlog_from = "0"
 
+                now = time.monotonic()
+                if now - last_claim >= claim_interval:
+                    claimed = self.reclaim()
+                    if claimed:
+                        self.process(claimed)
+                    last_claim = now
+                if now - last_trim >= trim_interval:
+                    self.trim()
+                    last_trim = now
+                if now - last_report >= stats_interval:
+                    report_stats(self.applier)
+                    print(f"[Sync Service] Stream: {self.stats()}")
+                    last_report = now
+            except redis.RedisError as e:
+                print(f"[Sync Service] Conexiune Redis pierdută: {e}. Reîncerc...")
+                time.sleep(self.retry_delay)
 
-if __name__ == "__main__":
+
+def run():
+    if SHARDING_ENABLED:
+        print("--- Serviciul de sincronizare: SHARDING=1, employees nu se replică ---")
+        return
     print("--- Serviciul de sincronizare (CRUD Ready) a pornit ---")
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe("db_sync_channel")
-    for message in pubsub.listen():
-        synchronize_data(message)
+    applier = PartitionedApplier(DB_CONFIGS, workers=SYNC_WORKERS, max_pending=SYNC_WORKER_QUEUE)
+    metrics = ReplicationMetrics()
+    if SYNC_METRICS_PORT:
+        start_metrics_server(metrics, SYNC_METRICS_PORT, extra_stats=applier.stats)
+    if SYNC_TRANSPORT == "stream":
+        StreamConsumer(
+            redis_client,
+            applier,
+            stream=SYNC_STREAM,
+            group=SYNC_GROUP,
+            consumer=SYNC_CONSUMER,
+            batch_size=SYNC_BATCH_SIZE,
+            claim_idle=SYNC_CLAIM_IDLE,
+            max_deliveries=SYNC_MAX_DELIVERIES,
+            metrics=metrics,
+        ).run(
+            stats_interval=SYNC_STATS_INTERVAL,
+            trim_interval=SYNC_TRIM_INTERVAL,
+        )
+    else:
+        run_pubsub(applier, metrics)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,257 @@
+# upstream_pool.py
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Headere hop-by-hop (RFC 7230 §6.1): descriu conexiunea curentă, nu mesajul,
+# deci un proxy nu are voie să le copieze de pe un hop pe altul.
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def end_to_end_headers(headers, drop=()):
+    """
+    Filtrează headerele hop-by-hop, inclusiv cele numite în `Connection`.
+    `headers` e o listă/iterabil de perechi (cheie, valoare).
+    """
+    headers = list(headers)
+    skipped = set(HOP_BY_HOP_HEADERS) | {h.lower() for h in drop}
+    for key, value in headers:
+        if key.lower() == "connection":
+            skipped.update(token.strip().lower() for token in value.split(",") if token.strip())
+    return [(key, value) for (key, value) in headers if key.lower() not in skipped]
+
+
+class UpstreamError(Exception):
+    """Eroare de rețea la comunicarea cu un backend."""
+
+
+class PooledConnection:
+    """O conexiune HTTP persistentă + contorii necesari pentru reciclare."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.requests_served = 0
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class UpstreamPool:
+    """
+    Pool de conexiuni keep-alive către un singur backend.
+
+    Conexiunile libere stau într-o stivă (LIFO) protejată de un lock, deci
+    pool-ul poate fi folosit din mai multe thread-uri Flask în paralel.
+    O conexiune este reciclată dacă a stat nefolosită mai mult de
+    `idle_timeout` secunde sau a servit deja `max_requests` cereri.
+    """
+
+    def __init__(self, base_url, max_size=10, idle_timeout=30.0, max_requests=1000, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+
+        # Statistici: hit = conexiune refolosită, miss = conexiune nouă
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+
+    def _new_connection(self):
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return PooledConnection(conn)
+
+    def _is_fresh(self, pooled, now):
+        return (
+            now - pooled.last_used < self.idle_timeout
+            and pooled.requests_served < self.max_requests
+        )
+
+    def acquire(self):
+        """Întoarce (conexiune, refolosită?)."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            pooled = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if self._is_fresh(candidate, now):
+                    pooled = candidate
+                    break
+                expired.append(candidate)
+            self.recycled += len(expired)
+            if pooled is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        for old in expired:
+            old.close()
+
+        if pooled is not None:
+            return pooled, True
+        return self._new_connection(), False
+
+    def release(self, pooled, reusable=True):
+        """Pune conexiunea înapoi în pool sau o închide."""
+        pooled.last_used = time.monotonic()
+        if reusable and pooled.requests_served < self.max_requests:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(pooled)
+                    return
+        else:
+            with self._lock:
+                self.recycled += 1
+        pooled.close()
+
+    def request(self, method, path, headers=None, body=None):
+        """
+        Trimite cererea și întoarce (conexiune, răspuns).
+        Apelantul citește răspunsul și apoi apelează release().
+        """
+        url = f"{self.prefix}{path}"
+        # Un body trimis în streaming nu poate fi retrimis după un eșec
+        replayable = body is None or isinstance(body, (bytes, bytearray))
+        for attempt in range(2):
+            pooled, reused = self.acquire()
+            try:
+                pooled.conn.request(method, url, body=body, headers=headers or {})
+                resp = pooled.conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                pooled.close()
+                # Backend-ul a închis conexiunea keep-alive între timp:
+                # mai încercăm o dată pe o conexiune nouă.
+                if reused and replayable and attempt == 0 and not isinstance(e, TimeoutError):
+                    continue
+                raise UpstreamError(f"{self.base_url}: {e}") from e
+            pooled.requests_served += 1
+            return pooled, resp
+
+    def fetch(self, method, path, headers=None, body=None):
+        """Varianta bufferizată: întoarce (status, headers, body)."""
+        pooled, resp = self.request(method, path, headers=headers, body=body)
+        try:
+            data = resp.read()
+        except (OSError, http.client.HTTPException) as e:
+            pooled.close()
+            raise UpstreamError(f"{self.base_url}: {e}") from e
+        self.release(pooled, reusable=not resp.will_close)
+        return resp.status, resp.getheaders(), data
+
+    def stream(self, method, path, headers=None, body=None, chunk_size=64 * 1024, on_close=None):
+        """
+        Varianta streaming: întoarce (status, headers, StreamedBody).
+        Body-ul cererii poate fi un iterabil de bucăți (trimis chunked dacă
+        lipsește Content-Length).
+        """
+        pooled, resp = self.request(method, path, headers=headers, body=body)
+        return resp.status, resp.getheaders(), StreamedBody(self, pooled, resp, chunk_size, on_close)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": self.base_url,
+                "idle": len(self._idle),
+                "hits": self.hits,
+                "misses": self.misses,
+                "recycled": self.recycled,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class StreamedBody:
+    """
+    Iterabil peste body-ul unui răspuns de la backend, citit în bucăți de
+    cel mult `chunk_size` octeți. Conexiunea se întoarce în pool doar dacă
+    răspunsul a fost citit complet; altfel (client deconectat, eroare) se
+    închide. O eroare de citire de la backend e raportată ca eșec
+    (`on_close(False)`); `close()`, apelat de WSGI la finalul răspunsului,
+    găsește body-ul necitit doar când clientul a plecat, deci nu e vina
+    backend-ului.
+    """
+
+    def __init__(self, pool, pooled, resp, chunk_size, on_close=None):
+        self.pool = pool
+        self.pooled = pooled
+        self.resp = resp
+        self.chunk_size = chunk_size
+        self.on_close = on_close
+        self._finished = False
+
+    def __iter__(self):
+        try:
+            while True:
+                chunk = self.resp.read1(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        except (OSError, http.client.HTTPException):
+            self._finish(complete=False)
+            raise
+        self._finish(complete=True)
+
+    def read(self):
+        """Citește tot restul body-ului (pentru apelanții care vor bytes)."""
+        return b"".join(self)
+
+    def close(self):
+        self.abandon()
+
+    def abandon(self):
+        """
+        Închide conexiunea fără ca backend-ul să fie socotit eșuat: am
+        renunțat noi la restul body-ului (altă sursă a eșuat sau clientul s-a
+        deconectat), iar un body nelimitat nu merită citit până la capăt.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self.pooled.close()
+        if self.on_close:
+            self.on_close(True)
+
+    def _finish(self, complete):
+        if self._finished:
+            return
+        self._finished = True
+        if complete:
+            # read1() nu închide singur răspunsul când Content-Length ajunge
+            # la zero; fără close(), conexiunea refuză următoarea cerere.
+            self.resp.close()
+            self.pool.release(self.pooled, reusable=not self.resp.will_close)
+        else:
+            self.pooled.close()
+        if self.on_close:
+            self.on_close(complete)